@@ -60,7 +60,10 @@ for i in range(100):
 __version__ = "0.0.8"
 
 from iometrics.network import NetworkMetrics
+from iometrics.pressure import PressureMetrics
 from iometrics.disk import DiskMetrics
+from iometrics.memory import MemoryIOMetrics
+from iometrics.mountstats import MountStatsMetrics
 
 # `__all__` is left here for documentation purposes and as a
 # reference to which interfaces are meant to be imported.
@@ -68,4 +71,7 @@ __all__ = [
     "__version__",
     "NetworkMetrics",
     "DiskMetrics",
+    "MountStatsMetrics",
+    "MemoryIOMetrics",
+    "PressureMetrics",
 ]
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+## Threshold alerts evaluated on every update.
+
+Rules are declared against any `AverageMetrics` of the meters, compiled once into flat lists
+and checked in O(rules) right after each sample, with hysteresis and cooldowns.
+
+```py
+from iometrics import DiskMetrics, NetworkMetrics
+from iometrics.alerts import AlertEngine, AlertRule
+from iometrics.sampler import MetricsSampler
+
+net, disk = NetworkMetrics(), DiskMetrics()
+engine = AlertEngine(
+    [
+        # Rolling 10 seconds mean above 95% for 30 seconds, resolved once back under 80%
+        AlertRule("disk_saturated", "disk.io_util", ">", 95, rolling_secs=10, for_secs=30, clear_threshold=80),
+        AlertRule("recv_collapsed", "net.mb_recv_ps", "<", 5, for_secs=5, when=lambda: training),
+    ],
+    sources={"net": net, "disk": disk},
+)
+engine.add_listener(print)
+
+sampler = MetricsSampler([net, disk])
+sampler.add_listener(engine.evaluate)
+sampler.start()
+```
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import operator
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.average_metrics import get_average_metrics
+
+
+COMPARATORS: Dict[str, Callable[[float, float], bool]] = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+@dataclass
+class AlertRule:
+
+    """Simple data class to declare a threshold rule against one metric like `"disk.io_util"`."""
+
+    name: str
+    # `<source>.<attribute>` and optionally `.avg` or `.smooth_avg` instead of the default last value `.val`.
+    metric: str
+    op: str = ">"
+    threshold: float = 0.0
+    # The condition has to hold this long before firing.
+    for_secs: float = 0.0
+    # Compare the mean over this many seconds instead of the last value.
+    rolling_secs: float = 0.0
+    # Hysteresis: once firing, only resolve when the value no longer passes this threshold. Default: `threshold`.
+    clear_threshold: Optional[float] = None
+    # Minimum seconds between two firings of the same rule.
+    cooldown_secs: float = 0.0
+    # Only evaluate while this returns True, e.g. while training, a firing rule resolves as soon as it returns False.
+    when: Optional[Callable[[], bool]] = None
+
+
+@dataclass
+class AlertEvent:
+
+    """Simple data class to store a rule state change."""
+
+    rule: str
+    metric: str
+    value: float
+    timestamp: float
+    firing: bool
+
+
+class AlertEngine:
+
+    """Evaluates compiled `AlertRule`s against the current values of the meters and notifies listeners."""
+
+    # pylint: disable=too-many-instance-attributes
+    # Rules are stored as parallel flat lists so evaluating them doesn't chase objects.
+
+    def __init__(self, rules: Sequence[AlertRule], sources: Dict[str, Any]) -> None:
+        self.rules: List[AlertRule] = list(rules)
+        self._listeners: List[Callable[[AlertEvent], None]] = []
+
+        # Compiled, read-only:
+        self._metrics: List[Tuple[AverageMetrics, str]] = []
+        self._compare: List[Callable[[float, float], bool]] = []
+        self._thresholds: List[float] = []
+        self._clear_thresholds: List[float] = []
+
+        # Mutable state:
+        # Samples of the last `rolling_secs` of each rule, left empty for the other rules.
+        self._windows: List[Deque[Tuple[float, float]]] = []
+        # Running sum of the values in each window, so averaging it doesn't walk the whole window.
+        self._window_sums: List[float] = []
+        self._pending_since: List[Optional[float]] = []
+        self._firing: List[bool] = []
+        self._last_fired: List[float] = []
+
+        for rule in self.rules:
+            self._compile(rule, sources)
+
+    def _compile(self, rule: AlertRule, sources: Dict[str, Any]) -> None:
+        if rule.op not in COMPARATORS:
+            raise ValueError(f"Rule {rule.name!r}: unknown operator {rule.op!r}, use one of {list(COMPARATORS)}")
+
+        source_name, _, attribute = rule.metric.partition(".")
+        metric_name, _, field_name = attribute.partition(".")
+        field_name = field_name or "val"
+
+        source = sources.get(source_name)
+        metric = get_average_metrics(source).get(metric_name) if source is not None else None
+        if metric is None or field_name not in ("val", "avg", "smooth_avg"):
+            raise ValueError(f"Rule {rule.name!r}: {rule.metric!r} is not a metric of sources {list(sources)}")
+
+        self._metrics.append((metric, field_name))
+        self._compare.append(COMPARATORS[rule.op])
+        self._thresholds.append(rule.threshold)
+        self._clear_thresholds.append(rule.threshold if rule.clear_threshold is None else rule.clear_threshold)
+        self._windows.append(deque())
+        self._window_sums.append(0.0)
+        self._pending_since.append(None)
+        self._firing.append(False)
+        self._last_fired.append(float("-inf"))
+
+    def _rolling_average(self, index: int, now: float, value: float) -> float:
+        window = self._windows[index]
+        window.append((now, value))
+        self._window_sums[index] += value
+        while window[0][0] < now - self.rules[index].rolling_secs:
+            self._window_sums[index] -= window.popleft()[1]
+        if len(window) == 1:
+            # Start over from the exact value so float rounding errors don't pile up.
+            self._window_sums[index] = value
+
+        return self._window_sums[index] / len(window)
+
+    def add_listener(self, listener: Callable[[AlertEvent], None]) -> None:
+        """Register a function called with every `AlertEvent`, i.e. when a rule fires or resolves."""
+        self._listeners.append(listener)
+
+    def firing(self) -> Dict[str, bool]:
+        """Return whether each rule is currently firing."""
+        return {rule.name: firing for rule, firing in zip(self.rules, self._firing)}
+
+    def evaluate(self, now: Optional[float] = None) -> List[AlertEvent]:
+        """Check all rules against the current metric values, return and dispatch the state changes."""
+        now = time.time() if now is None else now
+        events: List[AlertEvent] = []
+
+        for index, rule in enumerate(self.rules):
+            metric, field_name = self._metrics[index]
+            value: float = getattr(metric, field_name)
+
+            if rule.when is not None and not rule.when():
+                self._pending_since[index] = None
+                # Out of the guarded phase, e.g. in validation, a firing rule could never resolve otherwise.
+                if self._firing[index]:
+                    self._firing[index] = False
+                    events.append(AlertEvent(rule.name, rule.metric, value, now, firing=False))
+                continue
+
+            if rule.rolling_secs > 0:
+                value = self._rolling_average(index, now, value)
+
+            if self._firing[index]:
+                # Hysteresis: stay firing while the value still passes the clear threshold.
+                if not self._compare[index](value, self._clear_thresholds[index]):
+                    self._firing[index] = False
+                    self._pending_since[index] = None
+                    events.append(AlertEvent(rule.name, rule.metric, value, now, firing=False))
+                continue
+
+            if not self._compare[index](value, self._thresholds[index]):
+                self._pending_since[index] = None
+                continue
+
+            pending_since = self._pending_since[index]
+            if pending_since is None:
+                pending_since = self._pending_since[index] = now
+
+            if now - pending_since >= rule.for_secs and now - self._last_fired[index] >= rule.cooldown_secs:
+                self._firing[index] = True
+                self._last_fired[index] = now
+                events.append(AlertEvent(rule.name, rule.metric, value, now, firing=True))
+
+        for event in events:
+            for listener in self._listeners:
+                listener(event)
+
+        return events
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "AlertEngine",
+    "AlertRule",
+    "AlertEvent",
+]
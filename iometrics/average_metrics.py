@@ -4,11 +4,26 @@
 
 Computes and stores the average and current value of some metric.
 
+`AverageMetrics.freeze()` returns an immutable `AverageSnapshot` copy, safe to hand over to other threads.
+
 :copyright: (c) 2018 by Yaroslav Bulatov under The Unlicense <https://unlicense.org>
 :copyright: (c) 2021 by Leo Gallucci under Apache License 2.0.
 :license: Apache 2.0, see LICENSE for more details.
 """
 from dataclasses import dataclass
+from typing import Any
+from typing import Dict
+
+
+@dataclass(frozen=True)
+class AverageSnapshot:
+
+    """Simple data class to store an immutable copy of `AverageMetrics` values."""
+
+    val: float = 0.0
+    avg: float = 0.0
+    smooth_avg: float = 0.0
+    count: int = 0
 
 
 @dataclass
@@ -21,6 +36,7 @@ class AverageMetrics:
     avg: float = 0.0
     smooth_avg: float = 0.0
     tot_sum: float = 0.0
+    tot_weight: float = 0.0
     count: int = 0
 
     def __init__(self, avg_mom: float = 0.5) -> None:
@@ -33,23 +49,42 @@ class AverageMetrics:
         self.avg = 0.0
         self.smooth_avg = 0.0
         self.tot_sum = 0.0
+        self.tot_weight = 0.0
         self.count = 0
 
-    def update(self, val: float) -> None:
-        """Update last value and compute average, count, etc."""
+    def update(self, val: float, weight: float = 1.0) -> None:
+        """Update last value and compute average, count, etc.
+
+        Pass the seconds covered by `val` as `weight` to get a time-weighted `avg` when samples are not evenly spaced.
+        """
         # Use max(0) to prevent rounding -0.0 negative numbers
         self.val = max(0, val)
-        self.tot_sum += val
+        self.tot_sum += val * weight
+        self.tot_weight += weight
         if self.count == 0:
             self.smooth_avg = val
         else:
             self.smooth_avg = self.avg * self.avg_mom + val * (1 - self.avg_mom)
         self.count += 1
-        self.avg = self.tot_sum / self.count
+        self.avg = self.tot_sum / self.tot_weight if self.tot_weight > 0 else val
+
+    def freeze(self) -> AverageSnapshot:
+        """Return an immutable copy of the current values."""
+        return AverageSnapshot(val=self.val, avg=self.avg, smooth_avg=self.smooth_avg, count=self.count)
+
+
+def get_average_metrics(meter: Any) -> Dict[str, AverageMetrics]:
+    """Return the `AverageMetrics` of a meter keyed by name, the `metrics` of a `MetricSource` or its attributes."""
+    metrics = getattr(meter, "metrics", None)
+    if isinstance(metrics, dict):
+        return dict(metrics)
+    return {name: value for name, value in vars(meter).items() if isinstance(value, AverageMetrics)}
 
 
 # `__all__` is left here for documentation purposes and as a
 # reference to which interfaces are meant to be imported.
 __all__ = [
     "AverageMetrics",
+    "AverageSnapshot",
+    "get_average_metrics",
 ]
@@ -2,32 +2,131 @@
 """
 ## Command Line Interface.
 
+```sh
+iometrics start [--interval SECS] [--count N] [--devices vda,vdb] [--interfaces eth0] [--format table|jsonl|csv]
+iometrics serve [--port PORT] [--host HOST] [--interval SECS] [--max-interval SECS] [--track-overhead] [--sources process]
+iometrics replicate proc
+```
+
 :license: Apache 2.0, see LICENSE for more details.
 """
+import argparse
+import math
 import os
 import sys
 from time import sleep
+from typing import List
+from typing import Optional
+from typing import TextIO
+
+from iometrics.disk import DiskMetrics
+from iometrics.disk import get_diskstats_devices
+from iometrics.exporter import MetricsExporter
+from iometrics.network import get_network_interfaces
+from iometrics.network import NetworkMetrics
+from iometrics.output import OUTPUT_FORMATS
+from iometrics.output import SampleWriter
+from iometrics.sampler import iter_ticks
+from iometrics.sources import available_sources
+
+
+def _comma_separated(value: str) -> List[str]:
+    return [item for item in value.split(",") if item]
+
+
+def _positive_float(value: str) -> float:
+    number = float(value)
+    if number <= 0 or not math.isfinite(number):
+        raise argparse.ArgumentTypeError(f"{value} is not a positive number of seconds")
+    return number
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the parser of all `iometrics` sub-commands."""
+    parser = argparse.ArgumentParser(prog="iometrics", description="Network and Disk I/O Stats Monitor")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
 
-from iometrics.example import usage as print_metrics_live
+    start = commands.add_parser("start", help="Print live metrics", description=cmd_print_metrics_live.__doc__)
+    start.add_argument(
+        "--interval", type=_positive_float, default=1.0, help="Seconds between samples (default: %(default)s)"
+    )
+    start.add_argument("--count", type=int, default=None, help="Stop after this many samples (default: never)")
+    start.add_argument(
+        "--devices", type=_comma_separated, default=None, help="Comma separated disks, e.g. nvme0n1,sda (default: all)"
+    )
+    start.add_argument(
+        "--interfaces",
+        type=_comma_separated,
+        default=None,
+        help="Comma separated network interfaces, e.g. eth0 (default: all relevant)",
+    )
+    start.add_argument("--format", choices=OUTPUT_FORMATS, default="table", help="Output format (default: %(default)s)")
 
+    serve = commands.add_parser("serve", help="Serve OpenMetrics for Prometheus", description=cmd_serve.__doc__)
+    serve.add_argument("--port", type=int, default=9100, help="TCP port to listen on (default: %(default)s)")
+    serve.add_argument("--host", default="0.0.0.0", help="Address to bind to (default: %(default)s)")
+    serve.add_argument(
+        "--interval", type=_positive_float, default=1.0, help="Seconds between samples (default: %(default)s)"
+    )
+    serve.add_argument(
+        "--max-interval",
+        type=_positive_float,
+        default=None,
+        help="Sample adaptively: faster (down to --interval) during I/O bursts, slower (up to this) while idle",
+    )
+    serve.add_argument(
+        "--track-overhead", action="store_true", help="Also expose the time, CPU, /proc bytes and memory of sampling"
+    )
+    serve.add_argument(
+        "--sources",
+        type=_comma_separated,
+        default=[],
+        help=f"Comma separated extra metric sources, any of {','.join(available_sources())} (default: none)",
+    )
 
-def show_help() -> None:
-    """Show CLI help and capabilities."""
-    print("Available commands:")
-    print("iometrics start")
-    print("iometrics replicate proc")
+    replicate = commands.add_parser(
+        "replicate", help="Replicate /proc/net/dev for containers", description=cmd_replicate_proc_net_dev.__doc__
+    )
+    replicate.add_argument("what", choices=["proc"])
 
+    return parser
 
-def iometrics_cli_entrypoint() -> None:
+
+def iometrics_cli_entrypoint(argv: Optional[List[str]] = None) -> None:
     """Entrypoint for the `iometrics` executable."""
-    if len(sys.argv) < 2:
-        show_help()
+    parser = build_parser()
+    options = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    if options.command is None:
+        parser.print_help()
         sys.exit()
 
-    if sys.argv[1] == "start" and len(sys.argv) == 2:
-        cmd_print_metrics_live()
-    elif sys.argv[1] == "replicate" and sys.argv[2] == "proc" and len(sys.argv) == 3:
-        cmd_replicate_proc_net_dev()
+    if options.command == "start" and options.devices:
+        unknown_devices = sorted(set(options.devices) - set(get_diskstats_devices()))
+        if unknown_devices:
+            parser.error(f"unknown --devices {','.join(unknown_devices)}, see /proc/diskstats")
+
+    if options.command == "start" and options.interfaces:
+        unknown_interfaces = sorted(set(options.interfaces) - set(get_network_interfaces()))
+        if unknown_interfaces:
+            parser.error(f"unknown --interfaces {','.join(unknown_interfaces)}, see /proc/net/dev")
+
+    if options.command == "serve":
+        unknown_sources = sorted(set(options.sources) - set(available_sources()))
+        if unknown_sources:
+            parser.error(f"unknown --sources {','.join(unknown_sources)}, use any of {','.join(available_sources())}")
+        if options.max_interval is not None and options.max_interval < options.interval:
+            parser.error(f"--max-interval {options.max_interval:g} must not be below --interval {options.interval:g}")
+
+    try:
+        if options.command == "start":
+            cmd_print_metrics_live(options)
+        elif options.command == "serve":
+            cmd_serve(options)
+        elif options.command == "replicate":
+            cmd_replicate_proc_net_dev()
+    except KeyboardInterrupt:
+        pass
 
 
 def cmd_replicate_proc_net_dev() -> None:
@@ -37,6 +136,27 @@ def cmd_replicate_proc_net_dev() -> None:
         sleep(0.5)
 
 
-def cmd_print_metrics_live() -> None:
-    """Show CLI help and capabilities."""
-    print_metrics_live()
+def cmd_print_metrics_live(options: argparse.Namespace, stream: Optional[TextIO] = None) -> None:
+    """Print Network and Disk metrics every `--interval` seconds as a table, JSON Lines or CSV."""
+    net = NetworkMetrics(interfaces=options.interfaces)
+    disk = DiskMetrics(devices=options.devices)
+    writer = SampleWriter(sys.stdout if stream is None else stream, options.format)
+
+    for _ in iter_ticks(options.interval, options.count):
+        net.update_stats()
+        disk.update_stats()
+        writer.write(net, disk)
+
+
+def cmd_serve(options: argparse.Namespace) -> None:
+    """Serve `/metrics` in the OpenMetrics text format for Prometheus to scrape."""
+    exporter = MetricsExporter(
+        port=options.port,
+        host=options.host,
+        interval_secs=options.interval,
+        max_interval_secs=options.max_interval,
+        track_overhead=options.track_overhead,
+        sources=options.sources,
+    )
+    print(f"Serving OpenMetrics on http://{options.host}:{exporter.address[1]}/metrics")
+    exporter.serve_forever()
@@ -0,0 +1,484 @@
+#!/usr/bin/env python3
+"""
+## Cluster collector.
+
+Lightweight agents send compact binary snapshots of their Network and Disk stats over UDP or TCP
+to a central collector which keeps per-host ring buffers, cluster aggregates and the hottest hosts.
+
+```py
+# On every host
+from iometrics.cluster import ClusterAgent
+from iometrics.sampler import MetricsSampler
+
+agent = ClusterAgent(("collector.local", 9200))
+MetricsSampler([agent], interval_secs=1.0).start()
+
+# On the collector
+from iometrics.cluster import ClusterCollector
+
+collector = ClusterCollector(port=9200)
+collector.start()
+collector.aggregate().totals["mb_read_ps"]
+collector.top_hosts("io_util", n=10)
+```
+
+### Wire format
+
+Agents batch `batch_size` samples per message. The first sample of a batch is absolute, the following ones
+are delta-encoded against the previous sample. Values are sent with a 0.01 resolution as zig-zag varints,
+so an idle host costs only a couple of bytes per metric.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import heapq
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Deque
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+from typing import Union
+
+from iometrics.disk import DiskMetrics
+from iometrics.network import NetworkMetrics
+
+
+# Order matters, it's the order in which values are serialized.
+SNAPSHOT_FIELDS: Tuple[str, ...] = (
+    "mb_recv_ps",
+    "mb_sent_ps",
+    "io_util",
+    "mb_read_ps",
+    "mb_writ_ps",
+    "io_read_ps",
+    "io_writ_ps",
+    "io_wait",
+)
+
+WIRE_MAGIC = b"IM"
+WIRE_VERSION = 1
+
+# Values are transmitted as integers in hundredths.
+VALUE_SCALE = 100
+
+_HEADER = struct.Struct("!2sBB")
+_TIMESTAMP = struct.Struct("!Q")
+_TCP_FRAME = struct.Struct("!I")
+
+# Largest TCP frame accepted, a full batch of 255 samples is well below it.
+MAX_FRAME_BYTES = 65507
+
+# Raised by `decode_batch` on truncated or malformed messages.
+DECODE_ERRORS = (ValueError, IndexError, struct.error, UnicodeDecodeError)
+
+
+@dataclass
+class HostSnapshot:
+
+    """Simple data class to store one sample of a host's relevant statistics."""
+
+    timestamp: float = 0.0
+    mb_recv_ps: float = 0.0
+    mb_sent_ps: float = 0.0
+    io_util: float = 0.0
+    mb_read_ps: float = 0.0
+    mb_writ_ps: float = 0.0
+    io_read_ps: float = 0.0
+    io_writ_ps: float = 0.0
+    io_wait: float = 0.0
+
+
+@dataclass
+class ClusterAggregate:
+
+    """Simple data class to store cluster wide statistics computed from the latest sample of each host."""
+
+    num_hosts: int = 0
+    totals: Dict[str, float] = field(default_factory=dict)
+    means: Dict[str, float] = field(default_factory=dict)
+
+
+def snapshot_from_meters(net: Optional[NetworkMetrics], disk: Optional[DiskMetrics]) -> HostSnapshot:
+    """Build a `HostSnapshot` out of the last values of already updated meters."""
+    snapshot = HostSnapshot(timestamp=time.time())
+
+    # Read the published snapshots so each meter's values come from the same sample.
+    if net is not None:
+        net_snapshot = net.snapshot
+        snapshot.mb_recv_ps = net_snapshot.mb_recv_ps.val
+        snapshot.mb_sent_ps = net_snapshot.mb_sent_ps.val
+
+    if disk is not None:
+        disk_snapshot = disk.snapshot
+        snapshot.io_util = disk_snapshot.io_util.val
+        snapshot.mb_read_ps = disk_snapshot.mb_read.val
+        snapshot.mb_writ_ps = disk_snapshot.mb_writ.val
+        snapshot.io_read_ps = disk_snapshot.io_read.val
+        snapshot.io_writ_ps = disk_snapshot.io_writ.val
+        snapshot.io_wait = disk_snapshot.io_wait.val
+
+    return snapshot
+
+
+def _write_varint(out: bytearray, value: int) -> None:
+    # Zig-zag first so small negative deltas also take a single byte.
+    value = (value << 1) ^ (value >> 63)
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(payload: bytes, pos: int) -> Tuple[int, int]:
+    shift = 0
+    value = 0
+    while True:
+        byte = payload[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+    return (value >> 1) ^ -(value & 1), pos
+
+
+def encode_batch(host_name: str, snapshots: List[HostSnapshot]) -> bytes:
+    """Serialize a batch of samples of a single host, delta-encoding all but the first one."""
+    host_bytes = host_name.encode("utf-8")
+    if len(host_bytes) > 255 or len(snapshots) > 255:
+        raise ValueError("Host name and batch size must fit in 255 bytes / samples")
+
+    out = bytearray(_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, len(snapshots)))
+    out.append(len(host_bytes))
+    out += host_bytes
+
+    if not snapshots:
+        return bytes(out)
+
+    last_millis = int(snapshots[0].timestamp * 1000)
+    out += _TIMESTAMP.pack(last_millis)
+
+    last_values = [0] * len(SNAPSHOT_FIELDS)
+
+    for index, snapshot in enumerate(snapshots):
+        if index > 0:
+            millis = int(snapshot.timestamp * 1000)
+            _write_varint(out, millis - last_millis)
+            last_millis = millis
+
+        for field_index, field_name in enumerate(SNAPSHOT_FIELDS):
+            value = int(round(getattr(snapshot, field_name) * VALUE_SCALE))
+            _write_varint(out, value - last_values[field_index])
+            last_values[field_index] = value
+
+    return bytes(out)
+
+
+def decode_batch(payload: bytes) -> Tuple[str, List[HostSnapshot]]:
+    """Deserialize a message created by `encode_batch`."""
+    magic, version, count = _HEADER.unpack_from(payload, 0)
+    if magic != WIRE_MAGIC or version != WIRE_VERSION:
+        raise ValueError(f"Unknown iometrics wire format {magic!r} v{version}")
+
+    # One byte with the length of the host name then the name itself.
+    pos = _HEADER.size + 1
+    host_end = pos + payload[pos - 1]
+    host_name = payload[pos:host_end].decode("utf-8")
+    pos = host_end
+
+    snapshots: List[HostSnapshot] = []
+    if count == 0:
+        return host_name, snapshots
+
+    (millis,) = _TIMESTAMP.unpack_from(payload, pos)
+    pos += _TIMESTAMP.size
+
+    values = [0] * len(SNAPSHOT_FIELDS)
+
+    for index in range(count):
+        if index > 0:
+            delta, pos = _read_varint(payload, pos)
+            millis += delta
+
+        snapshot = HostSnapshot(timestamp=millis / 1000.0)
+        for field_index, field_name in enumerate(SNAPSHOT_FIELDS):
+            delta, pos = _read_varint(payload, pos)
+            values[field_index] += delta
+            setattr(snapshot, field_name, values[field_index] / VALUE_SCALE)
+
+        snapshots.append(snapshot)
+
+    return host_name, snapshots
+
+
+class ClusterAgent:
+
+    """Samples local Network and Disk stats and ships them in batches to a `ClusterCollector`."""
+
+    def __init__(
+        self,
+        collector_address: Tuple[str, int],
+        host_name: Optional[str] = None,
+        *,
+        batch_size: int = 10,
+        protocol: str = "udp",
+        track_network_utilization: bool = True,
+        track_disk_utilization: bool = True,
+    ) -> None:
+        # pylint: disable=too-many-arguments
+        # Where to send plus one keyword per meter and wire option.
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported protocol {protocol!r}, use 'udp' or 'tcp'")
+        if not 1 <= batch_size <= 255:
+            raise ValueError(f"batch_size={batch_size} must be between 1 and 255, the wire format counts it in a byte")
+
+        self.collector_address = collector_address
+        self.host_name: str = host_name or socket.gethostname()
+        self.batch_size = batch_size
+        self.protocol = protocol
+
+        self.net: Optional[NetworkMetrics] = NetworkMetrics() if track_network_utilization else None
+        self.disk: Optional[DiskMetrics] = DiskMetrics() if track_disk_utilization else None
+
+        self._pending: List[HostSnapshot] = []
+        self._sock: Optional[socket.socket] = None
+        # Batches lost because the collector couldn't be reached.
+        self.dropped_batches: int = 0
+
+    def update_stats(self) -> None:
+        """Sample the local meters and queue the result, flushing once a full batch is ready."""
+        if self.net is not None:
+            self.net.update_stats()
+        if self.disk is not None:
+            self.disk.update_stats()
+
+        self.record(snapshot_from_meters(self.net, self.disk))
+
+    def record(self, snapshot: HostSnapshot) -> None:
+        """Queue an already built snapshot, flushing once a full batch is ready."""
+        self._pending.append(snapshot)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send all queued samples now, a batch that can't be sent is dropped and counted in `dropped_batches`."""
+        if not self._pending:
+            return
+
+        payload = encode_batch(self.host_name, self._pending)
+        self._pending = []
+
+        try:
+            if self.protocol == "udp":
+                if self._sock is None:
+                    self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self._sock.sendto(payload, self.collector_address)
+            else:
+                if self._sock is None:
+                    self._sock = socket.create_connection(self.collector_address)
+                self._sock.sendall(_TCP_FRAME.pack(len(payload)) + payload)
+        except OSError:
+            # The collector restarted or is unreachable, reconnect on the next flush.
+            self.dropped_batches += 1
+            self._close_socket()
+
+    def close(self) -> None:
+        """Flush pending samples and release the socket."""
+        self.flush()
+        self._close_socket()
+
+    def _close_socket(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+
+class _UDPHandler(socketserver.BaseRequestHandler):
+
+    server: "_ThreadingUDPServer"
+
+    def handle(self) -> None:
+        payload: bytes = self.request[0]
+        self.server.collector.receive(payload)
+
+
+class _TCPHandler(socketserver.StreamRequestHandler):
+
+    server: "_ThreadingTCPServer"
+
+    def handle(self) -> None:
+        while True:
+            header = self.rfile.read(_TCP_FRAME.size)
+            if len(header) < _TCP_FRAME.size:
+                return
+            (size,) = _TCP_FRAME.unpack(header)
+            if size > MAX_FRAME_BYTES:
+                # Not an agent, or the stream lost sync: there's no way to find the next frame.
+                self.server.collector.drop_message()
+                return
+            self.server.collector.receive(self.rfile.read(size))
+
+
+class _ThreadingUDPServer(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+    # Big enough for batches of up to 255 samples.
+    max_packet_size = 65507
+    collector: "ClusterCollector"
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    collector: "ClusterCollector"
+
+
+class ClusterCollector:
+
+    """Receives snapshots from many agents, keeps per-host history and cluster wide aggregates."""
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 9200, protocol: str = "udp", history: int = 600) -> None:
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported protocol {protocol!r}, use 'udp' or 'tcp'")
+
+        self.history = history
+
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, Deque[HostSnapshot]] = {}
+        self._latest: Dict[str, HostSnapshot] = {}
+        self._last_seen: Dict[str, float] = {}
+        # Sum of the latest sample of every host, kept up to date on each ingest.
+        self._totals: Dict[str, float] = dict.fromkeys(SNAPSHOT_FIELDS, 0.0)
+        # Truncated or malformed messages received and ignored.
+        self.dropped_messages: int = 0
+
+        self._server: Union[_ThreadingUDPServer, _ThreadingTCPServer]
+        if protocol == "udp":
+            self._server = _ThreadingUDPServer((host, port), _UDPHandler)
+        else:
+            self._server = _ThreadingTCPServer((host, port), _TCPHandler)
+        self._server.collector = self
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Return the (host, port) actually bound, useful when `port=0` was requested."""
+        host, port = self._server.server_address[:2]
+        return str(host), int(port)
+
+    def start(self) -> None:
+        """Start receiving in a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="iometrics-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop receiving."""
+        if self._thread is not None:
+            self._server.shutdown()
+        self._server.server_close()
+
+    def receive(self, payload: bytes) -> bool:
+        """Ingest a message from the network, return False and count it as dropped if it can't be decoded."""
+        try:
+            self.ingest(payload)
+        except DECODE_ERRORS:
+            self.drop_message()
+            return False
+        return True
+
+    def drop_message(self) -> None:
+        """Count a message ignored because it's truncated, malformed or too big."""
+        with self._lock:
+            self.dropped_messages += 1
+
+    def ingest(self, payload: bytes) -> None:
+        """Decode a message from an agent and update history and aggregates."""
+        host_name, snapshots = decode_batch(payload)
+        if not snapshots:
+            return
+
+        with self._lock:
+            self._last_seen[host_name] = time.time()
+
+            previous = self._latest.get(host_name)
+            if previous is not None:
+                # UDP datagrams can arrive out of order, ignore samples older than the ones already received.
+                snapshots = [snapshot for snapshot in snapshots if snapshot.timestamp > previous.timestamp]
+                if not snapshots:
+                    return
+
+            ring = self._hosts.get(host_name)
+            if ring is None:
+                ring = self._hosts[host_name] = deque(maxlen=self.history)
+            ring.extend(snapshots)
+
+            newest = snapshots[-1]
+            for field_name in SNAPSHOT_FIELDS:
+                delta = getattr(newest, field_name)
+                if previous is not None:
+                    delta -= getattr(previous, field_name)
+                self._totals[field_name] += delta
+
+            self._latest[host_name] = newest
+
+    def forget_stale_hosts(self, max_age_secs: float) -> List[str]:
+        """Drop hosts not heard from in `max_age_secs` so they no longer count in the aggregates."""
+        deadline = time.time() - max_age_secs
+        with self._lock:
+            stale = [name for name, seen in self._last_seen.items() if seen < deadline]
+            for host_name in stale:
+                latest = self._latest.pop(host_name)
+                for field_name in SNAPSHOT_FIELDS:
+                    self._totals[field_name] -= getattr(latest, field_name)
+                del self._hosts[host_name]
+                del self._last_seen[host_name]
+        return stale
+
+    def hosts(self) -> List[str]:
+        """Return the names of the hosts currently known."""
+        with self._lock:
+            return list(self._latest)
+
+    def host_history(self, host_name: str) -> List[HostSnapshot]:
+        """Return the samples kept for one host, oldest first."""
+        with self._lock:
+            return list(self._hosts.get(host_name, ()))
+
+    def aggregate(self) -> ClusterAggregate:
+        """Return cluster totals and per-host means of the latest sample of each host."""
+        with self._lock:
+            num_hosts = len(self._latest)
+            totals = dict(self._totals)
+
+        means = {name: (value / num_hosts if num_hosts else 0.0) for name, value in totals.items()}
+        return ClusterAggregate(num_hosts=num_hosts, totals=totals, means=means)
+
+    def top_hosts(self, metric: str = "io_util", n: int = 10) -> List[Tuple[str, float]]:
+        """Return the `n` hosts with the highest latest value of `metric`, hottest first."""
+        if metric not in SNAPSHOT_FIELDS:
+            raise ValueError(f"Unknown metric {metric!r}, choose one of {SNAPSHOT_FIELDS}")
+
+        with self._lock:
+            values = [(name, getattr(snapshot, metric)) for name, snapshot in self._latest.items()]
+
+        return heapq.nlargest(n, values, key=lambda item: item[1])
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "ClusterAgent",
+    "ClusterCollector",
+    "ClusterAggregate",
+    "HostSnapshot",
+    "encode_batch",
+    "decode_batch",
+    "snapshot_from_meters",
+]
@@ -6,18 +6,50 @@ Ground truth comes from `/proc/diskstats`, a file with stats updated by the *nix
 
 The list of devices comes from `/sys/block` directory.
 
+### Stacked devices
+
+When dm-crypt, LVM or md RAID sit on top of physical disks the same bytes show up at every layer.
+The `slaves` and `holders` sysfs directories describe that stacking, see `BlockTopology`, so `DiskMetrics`
+only aggregates a single layer:
+
+- `layer="physical"` (default) – leaf physical disks, e.g. `nvme0n1`, `sda`.
+- `layer="logical"`  – top-level devices backed by physical disks, e.g. `dm-1` or `md0`.
+
+### Path-scoped metrics
+
+`DiskMetrics(paths=["/data/imagenet"])` only tracks the devices backing the given directories, resolved once
+through `os.stat().st_dev`, `/proc/self/mountinfo` and the sysfs topology.
+
+### Reading from other threads
+
+`update_stats()` mutates several `AverageMetrics` one after another, so a reader thread could see
+`mb_read` from one sample and `io_util` from the previous one. Other threads should read `disk.snapshot`
+instead: an immutable `DiskSnapshot` built at the end of each update and published with a single
+reference swap, so it is always consistent and no lock is needed.
+
 :copyright: (c) 2021 by Leo Gallucci.
 :license: Apache 2.0, see LICENSE for more details.
 """
+import functools
 import os
 import time
+import warnings
 from dataclasses import dataclass
+from dataclasses import field
 from typing import Dict
+from typing import FrozenSet
 from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Set
+from typing import Tuple
 
 import psutil
 
 from iometrics.average_metrics import AverageMetrics
+from iometrics.average_metrics import AverageSnapshot
+from iometrics.overhead import OverheadMetrics
+from iometrics.procfs import ProcFile
 
 
 @dataclass
@@ -44,11 +76,105 @@ class AggregateDiskStats:
     io_util: float = 0.0
 
 
+@dataclass(frozen=True)
+class DiskSnapshot:
+
+    """Simple data class to store a consistent, immutable view of `DiskMetrics` after one update."""
+
+    # pylint: disable=too-many-instance-attributes
+    # Mirrors the metrics of `DiskMetrics`.
+
+    timestamp: float
+    mb_read: AverageSnapshot
+    mb_writ: AverageSnapshot
+    io_read: AverageSnapshot
+    io_writ: AverageSnapshot
+    io_util: AverageSnapshot
+    io_wait: AverageSnapshot
+    # Fresh dicts every update, never mutated once published.
+    last_stats: Dict[str, DiskStats]
+    per_device_stats_ps: Dict[str, AggregateDiskStats]
+
+
+@dataclass(frozen=True)
+class BlockTopology:
+
+    """Simple data class to store how block devices are stacked on top of each other."""
+
+    # Whole-disk devices each device is built on (partitions already resolved to their disk).
+    slaves: Dict[str, Tuple[str, ...]]
+    # Devices built on top of each device or on top of any of its partitions.
+    holders: Dict[str, Tuple[str, ...]]
+    # Devices living under `/sys/devices/virtual`, e.g. `loop0`, `dm-0`, `md0`.
+    virtual: FrozenSet[str]
+    # Partition name to whole-disk name, e.g. `nvme0n1p2` -> `nvme0n1`.
+    partitions: Dict[str, str]
+    # Devices built on top of each partition, e.g. `nvme0n1p1` -> `dm-0`.
+    partition_holders: Dict[str, Tuple[str, ...]] = field(default_factory=dict)
+
+    def physical_devices(self, device_name: str) -> Set[str]:
+        """Return the leaf physical disks that end up serving the I/O of `device_name`."""
+        device_name = self.partitions.get(device_name, device_name)
+        slaves = self.slaves.get(device_name, ())
+
+        if not slaves:
+            return set() if device_name in self.virtual else {device_name}
+
+        physical: Set[str] = set()
+        for slave in slaves:
+            physical |= self.physical_devices(slave)
+        return physical
+
+    def leaves(self) -> List[str]:
+        """Return physical disks that are not built on top of other devices."""
+        return sorted(name for name in self.slaves if not self.slaves[name] and name not in self.virtual)
+
+    def top_level(self) -> List[str]:
+        """Return devices nothing else is stacked on and that are backed by at least one physical disk.
+
+        A disk with only some partitions held, e.g. `nvme0n1p2` under LVM next to a plain `/boot` on
+        `nvme0n1p1`, is replaced by its partitions that aren't held.
+        """
+        devices: List[str] = []
+
+        for name in self.slaves:
+            if not self.physical_devices(name):
+                continue
+            if not self.holders[name]:
+                devices.append(name)
+                continue
+
+            disk_partitions = [partition for partition, disk in self.partitions.items() if disk == name]
+            # The kernel can't stack a device on a whole disk whose partitions are in use, and the other way around.
+            if any(self.partition_holders.get(partition) for partition in disk_partitions):
+                devices.extend(partition for partition in disk_partitions if not self.partition_holders.get(partition))
+
+        return sorted(devices)
+
+    def layer_devices(self, layer: str) -> List[str]:
+        """Return the devices of one aggregation `layer`: "physical" or "logical"."""
+        if layer == "physical":
+            return self.leaves()
+        if layer == "logical":
+            return self.top_level()
+        raise ValueError(f"Unknown disk layer {layer!r}, use 'physical' or 'logical'")
+
+
 class DiskMetrics:
 
     """Tracks and computes disks read/written MBytes/s, also utilization and io counts metrics."""
 
-    def __init__(self) -> None:
+    # pylint: disable=too-many-instance-attributes
+    # One `AverageMetrics` per metric plus the sampling state.
+
+    def __init__(
+        self,
+        layer: str = "physical",
+        paths: Optional[Sequence[str]] = None,
+        devices: Optional[Sequence[str]] = None,
+        instrument: bool = False,
+    ) -> None:
+        """Pass `instrument=True` to also record what each `update_stats` call costs in `self.overhead`."""
         self.mb_read = AverageMetrics()
         self.mb_writ = AverageMetrics()
         self.io_read = AverageMetrics()
@@ -56,16 +182,49 @@ class DiskMetrics:
         self.io_util = AverageMetrics()
         self.io_wait = AverageMetrics()
 
-        self.non_virtual_devices = get_non_virtual_disk_devices()
+        # Only one layer of stacked devices is aggregated to avoid counting the same bytes twice.
+        if devices is not None:
+            self.devices: FrozenSet[str] = frozenset(devices)
+        elif paths is not None:
+            self.devices = frozenset(get_path_disk_devices(paths, layer))
+        else:
+            self.devices = frozenset(get_block_topology().layer_devices(layer))
+
+        self.overhead: Optional[OverheadMetrics] = OverheadMetrics() if instrument else None
+        self._diskstats = ProcFile("/proc/diskstats")
 
         self.last_stats: Dict[str, DiskStats] = self.get_disks_stats()
         self.last_log_time: float = time.time()
 
+        # Per-device rates computed during the last `update_stats` call.
+        self.per_device_stats_ps: Dict[str, AggregateDiskStats] = {}
+
+        # Replaced, never mutated, at the end of every `update_stats` call.
+        self.snapshot: DiskSnapshot = self.freeze()
+
+    @property
+    def non_virtual_devices(self) -> List[str]:
+        """Return the tracked devices, kept for backward compatibility: same as `devices`."""
+        return sorted(self.devices)
+
+    def freeze(self) -> DiskSnapshot:
+        """Return an immutable copy of the current metrics."""
+        return DiskSnapshot(
+            timestamp=self.last_log_time,
+            mb_read=self.mb_read.freeze(),
+            mb_writ=self.mb_writ.freeze(),
+            io_read=self.io_read.freeze(),
+            io_writ=self.io_writ.freeze(),
+            io_util=self.io_util.freeze(),
+            io_wait=self.io_wait.freeze(),
+            last_stats=self.last_stats,
+            per_device_stats_ps=self.per_device_stats_ps,
+        )
+
     def get_disks_stats(self) -> Dict[str, DiskStats]:
         """Return number of disk reads, writes, io (since the kernel started)."""
         # Note: all counters at /proc/* are starting with zero when the kernel starts.
-        with open("/proc/diskstats") as file:
-            content: str = file.read()
+        content: str = self._diskstats.read()
 
         lines = content.splitlines()
 
@@ -73,12 +232,14 @@ class DiskMetrics:
         stats: Dict[str, DiskStats] = {}
 
         for device_line in lines:
-            fields: List[str] = device_line.strip().split()
-            device_name: str = fields[2]
+            # Only split the whole line of the devices we track.
+            device_name: str = device_line.split(None, 3)[2]
 
-            if device_name not in self.non_virtual_devices:
+            if device_name not in self.devices:
                 continue
 
+            fields: List[str] = device_line.split()
+
             device_stats = DiskStats(
                 io_read=int(fields[3]),
                 io_writ=int(fields[7]),
@@ -95,15 +256,25 @@ class DiskMetrics:
         """Compute metrics since last measurement then returns stats per second."""
         time_delta: float = time.time() - self.last_log_time
 
+        # Two samples within the clock resolution would divide by zero.
+        if time_delta <= 0:
+            return
+
+        if self.overhead is not None:
+            self.overhead.start()
+        proc_bytes_before: int = self._diskstats.bytes_read
+
         per_device_stats: Dict[str, DiskStats] = self.get_disks_stats()
 
         # Disks I/O percentage of time that the CPU is waiting
         avg_io_wait_since_last_read: float = psutil.cpu_times_percent(interval=0).iowait
 
         aggr = AggregateDiskStats()
+        per_device_stats_ps: Dict[str, AggregateDiskStats] = {}
 
         for device_name, last_all_devices_stats in self.last_stats.items():
             new_aggr = compute_new_stats_ps(per_device_stats, last_all_devices_stats, device_name, time_delta)
+            per_device_stats_ps[device_name] = new_aggr
 
             aggr.mb_read_ps += new_aggr.mb_read_ps
             aggr.mb_writ_ps += new_aggr.mb_writ_ps
@@ -111,34 +282,166 @@ class DiskMetrics:
             aggr.io_writ_ps += new_aggr.io_writ_ps
             aggr.io_util += new_aggr.io_util
 
-        avg_disks_io_util: float = aggr.io_util / len(self.last_stats)
+        avg_disks_io_util: float = aggr.io_util / len(self.last_stats) if self.last_stats else 0.0
 
-        self.mb_read.update(aggr.mb_read_ps)
-        self.mb_writ.update(aggr.mb_writ_ps)
-        self.io_read.update(aggr.io_read_ps)
-        self.io_writ.update(aggr.io_writ_ps)
-        self.io_util.update(avg_disks_io_util)
-        self.io_wait.update(avg_io_wait_since_last_read)
+        self.mb_read.update(aggr.mb_read_ps, time_delta)
+        self.mb_writ.update(aggr.mb_writ_ps, time_delta)
+        self.io_read.update(aggr.io_read_ps, time_delta)
+        self.io_writ.update(aggr.io_writ_ps, time_delta)
+        self.io_util.update(avg_disks_io_util, time_delta)
+        self.io_wait.update(avg_io_wait_since_last_read, time_delta)
 
         self.last_log_time = time.time()
         self.last_stats = per_device_stats
+        self.per_device_stats_ps = per_device_stats_ps
+
+        # Publish with a single reference swap so readers never see a half-updated state.
+        self.snapshot = self.freeze()
+
+        if self.overhead is not None:
+            self.overhead.stop(self._diskstats.bytes_read - proc_bytes_before)
+
+    def close(self) -> None:
+        """Release the `/proc/diskstats` file handle."""
+        self._diskstats.close()
+
+
+def get_diskstats_devices(diskstats_path: str = "/proc/diskstats") -> List[str]:
+    """Return the names of all the devices listed in `/proc/diskstats`, partitions included."""
+    with open(diskstats_path, encoding="utf-8") as file:
+        return [device_line.split(None, 3)[2] for device_line in file]
+
+
+def _list_sysfs_dir(path: str) -> Tuple[str, ...]:
+    try:
+        return tuple(sorted(os.listdir(path)))
+    except OSError:
+        return ()
+
+
+@functools.lru_cache(maxsize=None)
+def get_block_topology(disks_devices_dir: str = "/sys/block") -> BlockTopology:
+    """Return how block devices are stacked, computed once from `slaves` and `holders` then cached."""
+    device_names: List[str] = sorted(os.listdir(disks_devices_dir))
+
+    virtual: Set[str] = set()
+    partitions: Dict[str, str] = {}
+
+    for device_name in device_names:
+        abs_device_path = os.path.join(disks_devices_dir, device_name)
 
+        if os.path.islink(abs_device_path) and "virtual" in os.readlink(abs_device_path):
+            virtual.add(device_name)
 
-def get_non_virtual_disk_devices() -> List[str]:
-    """Return a list of currently attached Disk names to which makes sense to measure I/O performance."""
-    disks_devices_dir = "/sys/block"
+        for entry in _list_sysfs_dir(abs_device_path):
+            if os.path.exists(os.path.join(abs_device_path, entry, "partition")):
+                partitions[entry] = device_name
 
-    non_virtual_devices: List[str] = []
+    slaves: Dict[str, Tuple[str, ...]] = {}
+    holders: Dict[str, Tuple[str, ...]] = {}
+    partition_holders: Dict[str, Tuple[str, ...]] = {}
 
-    for device_name in os.listdir(disks_devices_dir):
+    for device_name in device_names:
         abs_device_path = os.path.join(disks_devices_dir, device_name)
 
-        if os.path.islink(abs_device_path):
-            link_target = os.readlink(abs_device_path)
-            if "virtual" not in link_target:
-                non_virtual_devices.append(device_name)
+        device_slaves = _list_sysfs_dir(os.path.join(abs_device_path, "slaves"))
+        slaves[device_name] = tuple(sorted({partitions.get(slave, slave) for slave in device_slaves}))
+
+        # Devices can be stacked on top of a partition rather than on the whole disk.
+        device_holders: Set[str] = set(_list_sysfs_dir(os.path.join(abs_device_path, "holders")))
+        for partition, parent in partitions.items():
+            if parent == device_name:
+                partition_holders[partition] = tuple(
+                    sorted(_list_sysfs_dir(os.path.join(abs_device_path, partition, "holders")))
+                )
+                device_holders.update(partition_holders[partition])
+        holders[device_name] = tuple(sorted(device_holders))
+
+    return BlockTopology(
+        slaves=slaves,
+        holders=holders,
+        virtual=frozenset(virtual),
+        partitions=partitions,
+        partition_holders=partition_holders,
+    )
+
+
+def _get_mount_source_name(st_dev: int, mountinfo_path: str = "/proc/self/mountinfo") -> Optional[str]:
+    """Return the kernel name of the block device mounted with id `st_dev`, e.g. for btrfs or bind mounts."""
+    wanted = f"{os.major(st_dev)}:{os.minor(st_dev)}"
+
+    with open(mountinfo_path, encoding="utf-8") as file:
+        for line in file:
+            # 36 35 98:0 /mnt1 /mnt2 rw,noatime master:1 - ext3 /dev/root rw,errors=continue
+            fields: List[str] = line.split()
+            if fields[2] != wanted:
+                continue
+
+            source: str = fields[fields.index("-") + 2]
+            if source.startswith("/dev/"):
+                # `/dev/mapper/vg-data` is a symlink to e.g. `/dev/dm-1`
+                return os.path.basename(os.path.realpath(source))
+            return None
+
+    return None
+
+
+def _get_block_device_name(st_dev: int, sysfs_dev_dir: str = "/sys/dev/block") -> Optional[str]:
+    """Return the kernel name of a block device number, e.g. `nvme0n1p2` or `dm-1`."""
+    sysfs_path = os.path.join(sysfs_dev_dir, f"{os.major(st_dev)}:{os.minor(st_dev)}")
+    if not os.path.exists(sysfs_path):
+        return None
+    return os.path.basename(os.path.realpath(sysfs_path))
+
+
+def get_path_disk_devices(
+    paths: Sequence[str],
+    layer: str = "physical",
+    disks_devices_dir: str = "/sys/block",
+    sysfs_dev_dir: str = "/sys/dev/block",
+    mountinfo_path: str = "/proc/self/mountinfo",
+) -> List[str]:
+    """Return the devices of the aggregation `layer` that back the filesystems where `paths` live.
+
+    Warns about each path not backed by a local block device, e.g. tmpfs, NFS or overlayfs,
+    and raises `ValueError` when none of them is.
+    """
+    if layer not in ("physical", "logical"):
+        raise ValueError(f"Unknown disk layer {layer!r}, use 'physical' or 'logical'")
+
+    topology = get_block_topology(disks_devices_dir)
+    top_level: Set[str] = set(topology.top_level()) if layer == "logical" else set()
+    devices: Set[str] = set()
+
+    for path in paths:
+        st_dev: int = os.stat(path).st_dev
+
+        # Anonymous devices (major 0) like btrfs subvolumes: find the real device through the mount source.
+        if os.major(st_dev) == 0:
+            device_name = _get_mount_source_name(st_dev, mountinfo_path)
+        else:
+            device_name = _get_block_device_name(st_dev, sysfs_dev_dir)
+
+        partition_name = device_name
+        if device_name is not None:
+            device_name = topology.partitions.get(device_name, device_name)
+
+        if device_name is None or device_name not in topology.slaves:
+            warnings.warn(f"{path!r} is not backed by a local block device, its I/O won't be tracked")
+            continue
+
+        if layer == "physical":
+            devices |= topology.physical_devices(device_name)
+        elif partition_name in top_level:
+            # A partition of a disk split between layers, see `BlockTopology.top_level`.
+            devices.add(partition_name)
+        else:
+            devices.add(device_name)
+
+    if not devices:
+        raise ValueError(f"None of {list(paths)} is backed by a local block device")
 
-    return non_virtual_devices
+    return sorted(devices)
 
 
 def compute_new_stats_ps(
@@ -194,4 +497,10 @@ def compute_new_stats_ps(
 # reference to which interfaces are meant to be imported.
 __all__ = [
     "DiskMetrics",
+    "DiskSnapshot",
+    "DiskStats",
+    "AggregateDiskStats",
+    "BlockTopology",
+    "get_block_topology",
+    "get_path_disk_devices",
 ]
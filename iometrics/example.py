@@ -25,13 +25,8 @@ import time
 
 from iometrics import DiskMetrics
 from iometrics import NetworkMetrics
-
-
-DUAL_METRICS_HEADER = """
-|        Network (MBytes/s)       | Disk Util |            Disk MBytes          |             Disk I/O                                              |
-|     Received    |     Sent      |     %     |    MB/s Read    |  MB/s Written |     I/O Read    |   I/O Write   |     I/O Read    |   I/O Write   |
-|   val  |   avg  |  val  |  avg  | val | avg |  val   |  avg   |  val  |  avg  |   val  |   avg  |  val  |  avg  |   val  |   avg  |  val  |  avg  |
-| ------:| ------:| -----:| -----:| ---:| ---:| ------:| ------:| -----:| -----:| ------:| ------:| -----:| -----:| ------:| ------:| -----:| -----:|"""
+from iometrics.output import DUAL_METRICS_HEADER
+from iometrics.output import format_table_row
 
 
 def usage(iterations: int = 10000) -> str:
@@ -48,17 +43,7 @@ def usage(iterations: int = 10000) -> str:
 
         if i % 15 == 0:
             print(DUAL_METRICS_HEADER)
-        row = (
-            f"| {net.mb_recv_ps.val:6.1f} | {net.mb_recv_ps.avg:6.1f} "
-            f"| {net.mb_sent_ps.val:5.1f} | {net.mb_sent_ps.avg:5.1f} "
-            f"| {int(disk.io_util.val):3d} | {int(disk.io_util.avg):3d} "
-            f"| {disk.mb_read.val:6.1f} | {disk.mb_read.avg:6.1f} "
-            f"| {disk.mb_writ.val:5.1f} | {disk.mb_writ.avg:5.1f} "
-            f"| {int(disk.io_read.val):6d} | {int(disk.io_read.avg):6d} "
-            f"| {int(disk.io_writ.val):5d} | {int(disk.io_writ.avg):5d} "
-            f"| {int(disk.io_wait.val):5.1f} | {int(disk.io_wait.avg):5.1f} "
-            f"|"
-        )
+        row = format_table_row(net, disk)
         print(row)
 
     return row
@@ -68,4 +53,5 @@ def usage(iterations: int = 10000) -> str:
 # reference to which interfaces are meant to be imported.
 __all__ = [
     "usage",
+    "DUAL_METRICS_HEADER",
 ]
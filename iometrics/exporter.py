@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+## Prometheus / OpenMetrics exporter.
+
+Serves `/metrics` in the OpenMetrics text format while a background thread samples Network and Disk stats.
+
+The response body is rendered once per sample into an immutable `bytes` buffer, so the cost of a scrape
+does not depend on how often nor how many scrapers hit the endpoint.
+
+```sh
+iometrics serve --port 9100
+curl -s localhost:9100/metrics
+```
+
+Both the raw monotonic counters (as found in `/proc`) and the derived per second rates are exposed,
+labeled by network interface and disk device.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import re
+import threading
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.average_metrics import get_average_metrics
+from iometrics.disk import DiskMetrics
+from iometrics.disk import DiskSnapshot
+from iometrics.network import NetworkMetrics
+from iometrics.network import NetworkSnapshot
+from iometrics.overhead import OverheadMetrics
+from iometrics.sampler import AdaptiveSampler
+from iometrics.sampler import MetricsSampler
+from iometrics.sources import get_source
+from iometrics.tracing import TracingMetrics
+
+
+CONTENT_TYPE_OPENMETRICS = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+METRICS_PATH = "/metrics"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value: float) -> str:
+    # `repr` keeps full precision and renders integers as e.g. `123` instead of `123.0`
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _FamilyRenderer:
+
+    """Accumulates OpenMetrics lines for several metric families."""
+
+    def __init__(self) -> None:
+        self.lines: List[str] = []
+
+    def family(
+        self,
+        name: str,
+        metric_type: str,
+        help_text: str,
+        samples: Dict[str, float],
+        *,
+        label: str = "",
+        unit: str = "",
+    ) -> None:
+        """Add one metric family, `samples` maps each label value to its value (a single "" key means no label)."""
+        # pylint: disable=too-many-arguments
+        # The OpenMetrics `TYPE`, `HELP` and `UNIT` metadata plus the samples, kept flat for readable call sites.
+        self.lines.append(f"# TYPE {name} {metric_type}")
+        if unit:
+            self.lines.append(f"# UNIT {name} {unit}")
+        self.lines.append(f"# HELP {name} {help_text}")
+
+        sample_name = f"{name}_total" if metric_type == "counter" else name
+
+        for label_value, value in sorted(samples.items()):
+            if label:
+                labels = f'{{{label}="{_escape_label_value(label_value)}"}}'
+            else:
+                labels = ""
+            self.lines.append(f"{sample_name}{labels} {_format_value(value)}")
+
+    def histogram(
+        self, name: str, help_text: str, samples: Dict[str, OverheadMetrics], label: str, unit: str = ""
+    ) -> None:
+        """Add the wall time histogram of each `OverheadMetrics`, `samples` maps each label value to one of them."""
+        self.lines.append(f"# TYPE {name} histogram")
+        if unit:
+            self.lines.append(f"# UNIT {name} {unit}")
+        self.lines.append(f"# HELP {name} {help_text}")
+
+        for label_value, overhead in sorted(samples.items()):
+            labels = f'{label}="{_escape_label_value(label_value)}"'
+            for upper_bound, count in overhead.cumulative_buckets():
+                bound = "+Inf" if upper_bound == float("inf") else _format_value(upper_bound)
+                self.lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            self.lines.append(f"{name}_sum{{{labels}}} {_format_value(overhead.wall_us.tot_sum / 1e6)}")
+            self.lines.append(f"{name}_count{{{labels}}} {overhead.wall_us.count}")
+
+    def render(self) -> bytes:
+        """Return the final exposition including the mandatory `# EOF` terminator."""
+        return ("\n".join(self.lines + ["# EOF"]) + "\n").encode("utf-8")
+
+
+def _render_network(out: _FamilyRenderer, net: NetworkSnapshot) -> None:
+    counters = net.last_stats
+    rates = net.per_device_stats_ps
+
+    out.family(
+        "iometrics_network_received_bytes",
+        "counter",
+        "Bytes received by the interface since the kernel started.",
+        {name: stats.bytes_recv for name, stats in counters.items()},
+        label="interface",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_network_sent_bytes",
+        "counter",
+        "Bytes sent by the interface since the kernel started.",
+        {name: stats.bytes_sent for name, stats in counters.items()},
+        label="interface",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_network_received_mb_per_second",
+        "gauge",
+        "Received MB/s during the last sampling interval.",
+        {name: stats.mb_recv_ps for name, stats in rates.items()},
+        label="interface",
+    )
+    out.family(
+        "iometrics_network_sent_mb_per_second",
+        "gauge",
+        "Sent MB/s during the last sampling interval.",
+        {name: stats.mb_sent_ps for name, stats in rates.items()},
+        label="interface",
+    )
+
+
+def _render_disk(out: _FamilyRenderer, disk: DiskSnapshot) -> None:
+    counters = disk.last_stats
+    rates = disk.per_device_stats_ps
+
+    # Note `/proc/diskstats` counts 512 bytes sectors, see `compute_new_stats_ps`
+    out.family(
+        "iometrics_disk_read_bytes",
+        "counter",
+        "Bytes read from the device since the kernel started.",
+        {name: stats.kb_read * 512 for name, stats in counters.items()},
+        label="device",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_disk_written_bytes",
+        "counter",
+        "Bytes written to the device since the kernel started.",
+        {name: stats.kb_writ * 512 for name, stats in counters.items()},
+        label="device",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_disk_reads_completed",
+        "counter",
+        "Read I/O operations completed since the kernel started.",
+        {name: stats.io_read for name, stats in counters.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_writes_completed",
+        "counter",
+        "Write I/O operations completed since the kernel started.",
+        {name: stats.io_writ for name, stats in counters.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_io_time_seconds",
+        "counter",
+        "Seconds spent doing I/Os since the kernel started.",
+        {name: stats.io_util / 1000.0 for name, stats in counters.items()},
+        label="device",
+        unit="seconds",
+    )
+    out.family(
+        "iometrics_disk_read_mb_per_second",
+        "gauge",
+        "Read MB/s during the last sampling interval.",
+        {name: stats.mb_read_ps for name, stats in rates.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_written_mb_per_second",
+        "gauge",
+        "Written MB/s during the last sampling interval.",
+        {name: stats.mb_writ_ps for name, stats in rates.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_reads_per_second",
+        "gauge",
+        "Read I/O operations per second during the last sampling interval.",
+        {name: stats.io_read_ps for name, stats in rates.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_writes_per_second",
+        "gauge",
+        "Write I/O operations per second during the last sampling interval.",
+        {name: stats.io_writ_ps for name, stats in rates.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_disk_utilization_percent",
+        "gauge",
+        "Percentage of time the device was busy during the last sampling interval.",
+        {name: stats.io_util for name, stats in rates.items()},
+        label="device",
+    )
+    out.family(
+        "iometrics_cpu_io_wait_percent",
+        "gauge",
+        "Percentage of time the CPU was waiting for I/O during the last sampling interval.",
+        {"": disk.io_wait.val},
+    )
+
+
+def _render_overhead(out: _FamilyRenderer, overheads: Dict[str, OverheadMetrics]) -> None:
+    out.histogram(
+        "iometrics_sample_duration_seconds",
+        "Wall clock seconds each sample of the meter took.",
+        overheads,
+        label="meter",
+        unit="seconds",
+    )
+    out.family(
+        "iometrics_sample_cpu_seconds",
+        "gauge",
+        "CPU seconds the sampling thread spent on the last sample of the meter.",
+        {name: overhead.cpu_us.val / 1e6 for name, overhead in overheads.items()},
+        label="meter",
+        unit="seconds",
+    )
+    out.family(
+        "iometrics_sample_proc_bytes",
+        "gauge",
+        "Bytes read from /proc during the last sample of the meter.",
+        {name: overhead.proc_bytes.val for name, overhead in overheads.items()},
+        label="meter",
+    )
+    out.family(
+        "iometrics_sample_net_allocated_blocks",
+        "gauge",
+        "Growth of the memory blocks held by the interpreter during the last sample of the meter.",
+        {name: overhead.net_allocated_blocks.val for name, overhead in overheads.items()},
+        label="meter",
+    )
+
+
+def _render_tracing(out: _FamilyRenderer, trace: TracingMetrics) -> None:
+    counters = trace.last_stats
+    rates = trace.per_tag_stats_ps
+
+    out.family(
+        "iometrics_trace_read_bytes",
+        "counter",
+        "Bytes read through the traced readers of the tag since the process started.",
+        {tag: stats.bytes_read for tag, stats in counters.items()},
+        label="tag",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_trace_written_bytes",
+        "counter",
+        "Bytes written through the traced writers of the tag since the process started.",
+        {tag: stats.bytes_writ for tag, stats in counters.items()},
+        label="tag",
+        unit="bytes",
+    )
+    out.family(
+        "iometrics_trace_calls",
+        "counter",
+        "Traced calls of the tag since the process started.",
+        {tag: stats.calls for tag, stats in counters.items()},
+        label="tag",
+    )
+    out.family(
+        "iometrics_trace_latency_ms",
+        "gauge",
+        "Average latency in milliseconds of the traced calls of the tag during the last sampling interval.",
+        {tag: stats.latency_ms for tag, stats in rates.items()},
+        label="tag",
+    )
+
+
+def _render_sources(out: _FamilyRenderer, sources: Dict[str, Any]) -> None:
+    for source_name, meter in sources.items():
+        for metric_name, metric in get_average_metrics(meter).items():
+            # Namespaced apart from the families rendered per device, interface or tag, e.g. `iometrics_trace_calls`.
+            name = re.sub(r"[^a-zA-Z0-9_]", "_", f"iometrics_source_{source_name}_{metric_name}")
+            out.family(name, "gauge", f"Last value of {source_name}.{metric_name}.", {"": metric.val})
+
+        # Per-tag families next to the totals above.
+        if isinstance(meter, TracingMetrics):
+            _render_tracing(out, meter)
+
+
+def _render_meters(net: Optional[NetworkMetrics], disk: Optional[DiskMetrics]) -> _FamilyRenderer:
+    out = _FamilyRenderer()
+
+    # Render from the published snapshots so all the families of a meter come from the same sample.
+    if net is not None:
+        _render_network(out, net.snapshot)
+    if disk is not None:
+        _render_disk(out, disk.snapshot)
+
+    overheads: Dict[str, OverheadMetrics] = {}
+    if net is not None and net.overhead is not None:
+        overheads["network"] = net.overhead
+    if disk is not None and disk.overhead is not None:
+        overheads["disk"] = disk.overhead
+    if overheads:
+        _render_overhead(out, overheads)
+
+    return out
+
+
+def render_openmetrics(net: Optional[NetworkMetrics] = None, disk: Optional[DiskMetrics] = None) -> bytes:
+    """Render the current state of the given meters in the OpenMetrics text format."""
+    return _render_meters(net, disk).render()
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    """Serves the pre-rendered buffer, never touches the meters."""
+
+    server: "_MetricsHTTPServer"
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        """Reply with the latest rendered exposition."""
+        if self.path.split("?", 1)[0] != METRICS_PATH:
+            self.send_error(404, f"Only {METRICS_PATH} is served")
+            return
+
+        payload: bytes = self.server.get_payload()
+
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE_OPENMETRICS)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:  # pylint: disable=redefined-builtin
+        """Keep scrapes quiet, Prometheus hits the endpoint every few seconds."""
+
+
+class _MetricsHTTPServer(ThreadingHTTPServer):
+
+    """HTTP server that knows where to fetch the pre-rendered payload from."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], get_payload: Callable[[], bytes]) -> None:
+        super().__init__(address, _MetricsRequestHandler)
+        self.get_payload = get_payload
+
+
+class MetricsExporter:
+
+    """Samples Network and Disk stats in the background and serves them at `/metrics`."""
+
+    def __init__(
+        self,
+        port: int = 9100,
+        host: str = "0.0.0.0",
+        interval_secs: float = 1.0,
+        *,
+        track_network_utilization: bool = True,
+        track_disk_utilization: bool = True,
+        max_interval_secs: Optional[float] = None,
+        track_overhead: bool = False,
+        sources: Sequence[str] = (),
+    ) -> None:
+        """Sample every `interval_secs`, or adaptively between `interval_secs` and `max_interval_secs` if given.
+
+        With `track_overhead=True` the cost of each sample is exposed too, see `iometrics.overhead`.
+        `sources` names more registered sources to sample and expose, see `iometrics.sources`.
+        """
+        # pylint: disable=too-many-arguments
+        # One keyword per `iometrics serve` option.
+        self.net: Optional[NetworkMetrics] = None
+        self.disk: Optional[DiskMetrics] = None
+        if track_network_utilization:
+            self.net = NetworkMetrics(instrument=track_overhead)
+        if track_disk_utilization:
+            self.disk = DiskMetrics(instrument=track_overhead)
+
+        self.sources: Dict[str, Any] = {name: get_source(name) for name in sources}
+
+        meters = [meter for meter in (self.net, self.disk) if meter is not None] + list(self.sources.values())
+        if max_interval_secs is None:
+            self.sampler: MetricsSampler = MetricsSampler(meters, interval_secs=interval_secs)
+        else:
+            self.sampler = AdaptiveSampler(meters, min_interval_secs=interval_secs, max_interval_secs=max_interval_secs)
+        self.sampler.add_listener(self._refresh_payload)
+
+        # Rebuilt only when a new sample lands then published with a single reference swap.
+        self._payload: bytes = b""
+        self._refresh_payload()
+
+        self._httpd = _MetricsHTTPServer((host, port), self.get_payload)
+        self._serve_thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """Return the (host, port) actually bound, useful when `port=0` was requested."""
+        host, port = self._httpd.server_address[:2]
+        return str(host), int(port)
+
+    def get_payload(self) -> bytes:
+        """Return the latest rendered exposition."""
+        return self._payload
+
+    def _refresh_payload(self) -> None:
+        out = _render_meters(self.net, self.disk)
+        _render_sources(out, self.sources)
+        out.family(
+            "iometrics_sample_rate_hz",
+            "gauge",
+            "Samples per second actually taken since the exporter started.",
+            {"": self.sampler.sample_rate_hz.avg},
+        )
+        out.family(
+            "iometrics_sample_errors",
+            "counter",
+            "Samples that failed since the exporter started, the served values are stale while this grows.",
+            {"": self.sampler.failed_samples},
+        )
+        self._payload = out.render()
+
+    def start(self) -> None:
+        """Start sampling and serving in background threads."""
+        self.sampler.start()
+        self._serve_thread = threading.Thread(
+            target=self._httpd.serve_forever, name="iometrics-exporter", daemon=True
+        )
+        self._serve_thread.start()
+
+    def serve_forever(self) -> None:
+        """Start sampling in the background and serve HTTP requests in the current thread."""
+        self.sampler.start()
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self.sampler.stop()
+
+    def stop(self) -> None:
+        """Stop serving and sampling."""
+        # `shutdown()` blocks until `serve_forever()` returns so only call it when it is running.
+        if self._serve_thread is not None:
+            self._httpd.shutdown()
+        self._httpd.server_close()
+        self.sampler.stop()
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MetricsExporter",
+    "render_openmetrics",
+    "CONTENT_TYPE_OPENMETRICS",
+]
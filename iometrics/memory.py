@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""
+## Classes to store Page Cache and Writeback Statistics.
+
+Ground truth comes from `/proc/vmstat`, `/proc/meminfo` and `/proc/self/io`, files with stats updated by the *nix kernel.
+
+`DiskMetrics` only sees what reaches the devices: re-reads served from the page cache and checkpoint writes
+still sitting in dirty pages never show up there. These metrics fill that gap, e.g. to size dataset caching
+or to spot writeback storms stalling the training.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import os
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import ClassVar
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.metric_source import MetricSource
+from iometrics.procfs import ProcFile
+
+
+VMSTAT_KEYS: Tuple[str, ...] = ("pgpgin", "pgpgout", "pgmajfault")
+MEMINFO_KEYS: Tuple[str, ...] = ("Cached", "Dirty", "Writeback")
+IO_KEYS: Tuple[str, ...] = ("rchar", "read_bytes")
+
+
+@dataclass
+class MemoryIOStats:
+
+    """Simple data class to store page cache relevant statistics."""
+
+    # Counters since the kernel started, `/proc/vmstat` reports paging in KiB.
+    kb_pgin: int = 0
+    kb_pgout: int = 0
+    major_faults: int = 0
+    # Gauges in KiB.
+    kb_cached: int = 0
+    kb_dirty: int = 0
+    kb_writeback: int = 0
+    # Counters of the traced process: bytes returned by `read()` calls and bytes actually fetched from storage.
+    rchar: int = 0
+    read_bytes: int = 0
+    # Bytes read from `/proc` files by all the meters of this process, see `ProcFile.total_bytes_read`.
+    proc_bytes: int = 0
+
+
+class MemoryIOMetrics(MetricSource):
+
+    """Tracks and computes paged in/out MBytes/s, major faults/s, read cache hit %, dirty and writeback MBytes.
+
+    `read_hit` is the percentage of the bytes read by the process at `io_path` that did not have to be fetched
+    from storage, i.e. `100 * (1 - read_bytes / rchar)` out of its I/O counters. It only covers that process,
+    pass e.g. `/proc/<pid>/io` of a DataLoader worker to watch it instead, and it is only updated when the
+    process read something: `last_read_hit` is `None` after intervals without reads.
+
+    When watching this very process, the `/proc` files read by every meter are left out. Other `/proc` or
+    `/sys` reads, e.g. psutil calls, can't be told apart and count as cache hits.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+    # A typed alias of `metrics` per exported metric, plus one persistent handle per `/proc` file.
+
+    RATES: ClassVar[Dict[str, Tuple[str, float]]] = {
+        "mb_pgin": ("kb_pgin", 1024.0 / 1e6),
+        "mb_pgout": ("kb_pgout", 1024.0 / 1e6),
+        "major_faults": ("major_faults", 1.0),
+    }
+    GAUGES: ClassVar[Dict[str, Tuple[str, float]]] = {
+        "mb_cached": ("kb_cached", 1024.0 / 1e6),
+        "mb_dirty": ("kb_dirty", 1024.0 / 1e6),
+        "mb_writeback": ("kb_writeback", 1024.0 / 1e6),
+    }
+
+    def __init__(
+        self, vmstat_path: str = "/proc/vmstat", meminfo_path: str = "/proc/meminfo", io_path: str = "/proc/self/io"
+    ) -> None:
+        self._vmstat = ProcFile(vmstat_path)
+        self._meminfo = ProcFile(meminfo_path)
+        self._io = ProcFile(io_path)
+        # Our own meters' reads only show up in our own `rchar`.
+        self._is_own_io: bool = os.path.realpath(io_path) == os.path.realpath("/proc/self/io")
+
+        # Read cache hit percentage of the last interval, `None` if nothing was read.
+        self.last_read_hit: Optional[float] = None
+
+        super().__init__()
+        # Not a plain rate, `derive` only reports it for intervals with reads.
+        self.metrics["read_hit"] = AverageMetrics()
+
+        self.mb_pgin: AverageMetrics = self.metrics["mb_pgin"]
+        self.mb_pgout: AverageMetrics = self.metrics["mb_pgout"]
+        self.major_faults: AverageMetrics = self.metrics["major_faults"]
+        self.read_hit: AverageMetrics = self.metrics["read_hit"]
+        self.mb_cached: AverageMetrics = self.metrics["mb_cached"]
+        self.mb_dirty: AverageMetrics = self.metrics["mb_dirty"]
+        self.mb_writeback: AverageMetrics = self.metrics["mb_writeback"]
+
+    def get_memory_io_stats(self) -> MemoryIOStats:
+        """Return paging counters (since the kernel started) and the current page cache sizes."""
+        vmstat: Dict[str, int] = parse_key_values(self._vmstat.read(), VMSTAT_KEYS)
+        meminfo: Dict[str, int] = parse_key_values(self._meminfo.read(), MEMINFO_KEYS)
+        proc_io: Dict[str, int] = parse_key_values(self._io.read(), IO_KEYS)
+
+        return MemoryIOStats(
+            kb_pgin=vmstat["pgpgin"],
+            kb_pgout=vmstat["pgpgout"],
+            major_faults=vmstat["pgmajfault"],
+            kb_cached=meminfo["Cached"],
+            kb_dirty=meminfo["Dirty"],
+            kb_writeback=meminfo["Writeback"],
+            rchar=proc_io["rchar"],
+            read_bytes=proc_io["read_bytes"],
+            proc_bytes=ProcFile.total_bytes_read if self._is_own_io else 0,
+        )
+
+    def read(self) -> Dict[str, float]:
+        """Return the counters and gauges of `MemoryIOStats` keyed by field name."""
+        return {counter_name: float(value) for counter_name, value in asdict(self.get_memory_io_stats()).items()}
+
+    def derive(self, new_stats: Dict[str, float], time_delta: float) -> Dict[str, float]:
+        """Return the paging rates and page cache sizes, plus the read cache hit percentage if anything was read."""
+        values: Dict[str, float] = super().derive(new_stats, time_delta)
+        last_stats: Dict[str, float] = self.last_stats
+
+        # There's a bug that sometimes the delta is negative messing up the average.
+        read_bytes_delta: float = max(0.0, new_stats["read_bytes"] - last_stats["read_bytes"])
+        # Reading the `/proc` files of our own meters must not count as reads served from memory.
+        proc_bytes_delta: float = new_stats["proc_bytes"] - last_stats["proc_bytes"]
+        rchar_delta: float = max(0.0, new_stats["rchar"] - last_stats["rchar"] - proc_bytes_delta)
+
+        # `rchar` also counts pipes and sockets, so this is an upper bound of the page cache hit ratio.
+        self.last_read_hit = None
+        if rchar_delta > 0:
+            self.last_read_hit = 100.0 * (1.0 - min(read_bytes_delta, rchar_delta) / rchar_delta)
+            values["read_hit"] = self.last_read_hit
+
+        return values
+
+    def close(self) -> None:
+        """Release the `/proc` file handles."""
+        self._vmstat.close()
+        self._meminfo.close()
+        self._io.close()
+
+
+def parse_key_values(content: str, keys: Tuple[str, ...]) -> Dict[str, int]:
+    """Parse `key value` or `Key: value kB` lines, only for the given keys which default to 0 if missing."""
+    values: Dict[str, int] = dict.fromkeys(keys, 0)
+    remaining: int = len(keys)
+
+    for line in content.splitlines():
+        key, _, rest = line.partition(" ")
+        key = key.rstrip(":")
+        if key in values:
+            values[key] = int(rest.split()[0])
+            remaining -= 1
+            if remaining == 0:
+                break
+
+    return values
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MemoryIOMetrics",
+    "MemoryIOStats",
+]
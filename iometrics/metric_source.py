@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+## Base class of the counter based metric sources.
+
+A source only reads raw counters and declares which of them are rates and which are gauges, `MetricSource`
+takes care of the deltas, the negative delta clamping, the per second rates and the `AverageMetrics`.
+It lives apart from the `iometrics.sources` registry so the built-in meters can build on it.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import abc
+import time
+from typing import ClassVar
+from typing import Dict
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+
+
+class MetricSource(abc.ABC):
+
+    """Base class of pluggable sources: `read()` returns raw counters that are turned into `AverageMetrics`."""
+
+    # Metric name to (counter name, scale), tracked as `counter delta * scale / seconds`, e.g. MB/s out of bytes.
+    RATES: ClassVar[Dict[str, Tuple[str, float]]] = {}
+    # Metric name to (counter name, scale), tracked as `counter * scale` for counters that go up and down.
+    GAUGES: ClassVar[Dict[str, Tuple[str, float]]] = {}
+
+    def __init__(self) -> None:
+        # One `AverageMetrics` per metric of `RATES` and `GAUGES`, subclasses can add more before calling `derive`.
+        self.metrics: Dict[str, AverageMetrics] = {name: AverageMetrics() for name in [*self.RATES, *self.GAUGES]}
+
+        self.last_stats: Dict[str, float] = self.read()
+        self.last_log_time: float = time.time()
+
+    @abc.abstractmethod
+    def read(self) -> Dict[str, float]:
+        """Return the raw counters, keyed by counter name."""
+
+    def derive(self, new_stats: Dict[str, float], time_delta: float) -> Dict[str, float]:
+        """Return the value of each metric from the new counters, override it for anything fancier than `RATES`."""
+        values: Dict[str, float] = {}
+
+        for metric_name, (counter_name, scale) in self.RATES.items():
+            # There's a bug that sometimes the delta is negative messing up the average.
+            delta: float = max(0.0, new_stats.get(counter_name, 0.0) - self.last_stats.get(counter_name, 0.0))
+            values[metric_name] = delta * scale / time_delta
+
+        for metric_name, (counter_name, scale) in self.GAUGES.items():
+            values[metric_name] = new_stats.get(counter_name, 0.0) * scale
+
+        return values
+
+    def update_from(self, new_stats: Dict[str, float], now: float) -> None:
+        """Compute metrics out of counters read at `now`, which lets a scheduler share one timestamp."""
+        time_delta: float = now - self.last_log_time
+
+        # Two samples within the clock resolution would divide by zero.
+        if time_delta <= 0:
+            return
+
+        for metric_name, value in self.derive(new_stats, time_delta).items():
+            self.metrics[metric_name].update(value, time_delta)
+
+        self.last_log_time = now
+        self.last_stats = new_stats
+
+    def update_stats(self) -> None:
+        """Compute metrics since last measurement then returns stats per second."""
+        self.update_from(self.read(), time.time())
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MetricSource",
+]
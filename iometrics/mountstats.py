@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+## Classes to store NFS (network filesystem) client Statistics.
+
+Ground truth comes from `/proc/self/mountstats`, a file with per mount stats updated by the *nix kernel.
+Mounts of the same export share their counters, so stats are kept per export (`server:/path`) to
+not count bind mounts twice.
+
+NFS (and AWS EFS) traffic only shows up as undifferentiated bytes in `NetworkMetrics` and never in `DiskMetrics`,
+this tells a slow filer (high execute time) from a slow network (high RTT, retransmissions).
+
+```py
+from iometrics.mountstats import MountStatsMetrics
+nfs = MountStatsMetrics()
+nfs.update_stats()
+nfs.mb_read.val, nfs.read_rtt_ms.val
+```
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import time
+from dataclasses import dataclass
+from dataclasses import fields as dataclass_fields
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.average_metrics import AverageSnapshot
+from iometrics.overhead import OverheadMetrics
+from iometrics.procfs import ProcFile
+
+
+NFS_FSTYPES: Tuple[str, ...] = ("nfs", "nfs4")
+
+
+@dataclass
+class MountStats:
+
+    """Simple data class to store a NFS mount's relevant statistics."""
+
+    bytes_read: int = 0
+    bytes_writ: int = 0
+    ops: int = 0
+    retrans: int = 0
+    read_ops: int = 0
+    read_rtt_ms: int = 0
+    read_exe_ms: int = 0
+    writ_ops: int = 0
+    writ_rtt_ms: int = 0
+    writ_exe_ms: int = 0
+
+
+@dataclass
+class AggregateMountStats:
+
+    """Simple data class to store NFS mounts aggregate relevant statistics."""
+
+    mb_read_ps: float = 0.0
+    mb_writ_ps: float = 0.0
+    ops_ps: float = 0.0
+    retrans_ps: float = 0.0
+    read_rtt_ms: float = 0.0
+    read_exe_ms: float = 0.0
+    writ_rtt_ms: float = 0.0
+    writ_exe_ms: float = 0.0
+
+
+@dataclass(frozen=True)
+class MountStatsSnapshot:
+
+    """Simple data class to store a consistent, immutable view of `MountStatsMetrics` after one update."""
+
+    # pylint: disable=too-many-instance-attributes
+    # Mirrors the metrics of `MountStatsMetrics`.
+
+    timestamp: float
+    mb_read: AverageSnapshot
+    mb_writ: AverageSnapshot
+    ops: AverageSnapshot
+    retrans: AverageSnapshot
+    read_rtt_ms: AverageSnapshot
+    read_exe_ms: AverageSnapshot
+    writ_rtt_ms: AverageSnapshot
+    writ_exe_ms: AverageSnapshot
+    # Fresh dicts every update, never mutated once published.
+    last_stats: Dict[str, MountStats]
+    per_export_stats_ps: Dict[str, AggregateMountStats]
+
+
+MOUNT_STATS_FIELDS: Tuple[str, ...] = tuple(field.name for field in dataclass_fields(MountStats))
+
+
+class MountStatsMetrics:
+
+    """Tracks and computes NFS read/written MBytes/s, operations/s, retransmissions and per-op latencies."""
+
+    # pylint: disable=too-many-instance-attributes
+    # One `AverageMetrics` per metric plus the sampling state.
+
+    def __init__(self, mountstats_path: str = "/proc/self/mountstats", instrument: bool = False) -> None:
+        """Pass `instrument=True` to also record what each `update_stats` call costs in `self.overhead`."""
+        self.mb_read = AverageMetrics()
+        self.mb_writ = AverageMetrics()
+        self.ops = AverageMetrics()
+        self.retrans = AverageMetrics()
+        self.read_rtt_ms = AverageMetrics()
+        self.read_exe_ms = AverageMetrics()
+        self.writ_rtt_ms = AverageMetrics()
+        self.writ_exe_ms = AverageMetrics()
+
+        self.overhead: Optional[OverheadMetrics] = OverheadMetrics() if instrument else None
+        self._mountstats = ProcFile(mountstats_path)
+
+        self.last_stats: Dict[str, MountStats] = parse_mounts_stats(self._mountstats.read())
+        self.last_log_time: float = time.time()
+
+        # Per export rates computed during the last `update_stats` call.
+        self.per_export_stats_ps: Dict[str, AggregateMountStats] = {}
+
+        # Replaced, never mutated, at the end of every `update_stats` call.
+        self.snapshot: MountStatsSnapshot = self.freeze()
+
+    def freeze(self) -> MountStatsSnapshot:
+        """Return an immutable copy of the current metrics."""
+        return MountStatsSnapshot(
+            timestamp=self.last_log_time,
+            mb_read=self.mb_read.freeze(),
+            mb_writ=self.mb_writ.freeze(),
+            ops=self.ops.freeze(),
+            retrans=self.retrans.freeze(),
+            read_rtt_ms=self.read_rtt_ms.freeze(),
+            read_exe_ms=self.read_exe_ms.freeze(),
+            writ_rtt_ms=self.writ_rtt_ms.freeze(),
+            writ_exe_ms=self.writ_exe_ms.freeze(),
+            last_stats=self.last_stats,
+            per_export_stats_ps=self.per_export_stats_ps,
+        )
+
+    def update_stats(self) -> None:
+        """Compute metrics since last measurement then returns stats per second."""
+        now: float = time.time()
+        time_delta: float = now - self.last_log_time
+
+        # Two samples within the clock resolution would divide by zero.
+        if time_delta <= 0:
+            return
+
+        proc_bytes_before: int = self._mountstats.bytes_read
+        if self.overhead is not None:
+            self.overhead.start()
+
+        new_stats: Dict[str, MountStats] = parse_mounts_stats(self._mountstats.read())
+
+        total = MountStats()
+        per_export_stats_ps: Dict[str, AggregateMountStats] = {}
+
+        for export, last_stats in self.last_stats.items():
+            # NFS shares can get unmounted in between so validate key:
+            if export not in new_stats:
+                continue
+
+            delta = compute_mount_stats_delta(new_stats[export], last_stats)
+            per_export_stats_ps[export] = compute_mount_stats_ps(delta, time_delta)
+
+            for field_name in MOUNT_STATS_FIELDS:
+                setattr(total, field_name, getattr(total, field_name) + getattr(delta, field_name))
+
+        aggr = compute_mount_stats_ps(total, time_delta)
+
+        self.mb_read.update(aggr.mb_read_ps, time_delta)
+        self.mb_writ.update(aggr.mb_writ_ps, time_delta)
+        self.ops.update(aggr.ops_ps, time_delta)
+        self.retrans.update(aggr.retrans_ps, time_delta)
+        self.read_rtt_ms.update(aggr.read_rtt_ms, time_delta)
+        self.read_exe_ms.update(aggr.read_exe_ms, time_delta)
+        self.writ_rtt_ms.update(aggr.writ_rtt_ms, time_delta)
+        self.writ_exe_ms.update(aggr.writ_exe_ms, time_delta)
+
+        self.last_log_time = now
+        self.last_stats = new_stats
+        self.per_export_stats_ps = per_export_stats_ps
+
+        # Publish with a single reference swap so readers never see a half-updated state.
+        self.snapshot = self.freeze()
+
+        if self.overhead is not None:
+            self.overhead.stop(self._mountstats.bytes_read - proc_bytes_before)
+
+    def close(self) -> None:
+        """Release the `/proc/self/mountstats` file handle."""
+        self._mountstats.close()
+
+
+def _parse_per_op_line(line: str, stats: MountStats) -> None:
+    # READ: ops transmissions major_timeouts bytes_sent bytes_recv queue_ms rtt_ms execute_ms [errors]
+    op_name, _, values = line.partition(":")
+    fields: List[str] = values.split()
+    if len(fields) < 8:
+        return
+
+    ops = int(fields[0])
+    stats.ops += ops
+    stats.retrans += max(0, int(fields[1]) - ops)
+
+    if op_name == "READ":
+        stats.read_ops = ops
+        stats.read_rtt_ms = int(fields[6])
+        stats.read_exe_ms = int(fields[7])
+    elif op_name == "WRITE":
+        stats.writ_ops = ops
+        stats.writ_rtt_ms = int(fields[6])
+        stats.writ_exe_ms = int(fields[7])
+
+
+def get_mounts_stats(mountstats_path: str = "/proc/self/mountstats") -> Dict[str, MountStats]:
+    """Return NFS bytes, operations and latencies per export (since each share was mounted)."""
+    with open(mountstats_path, encoding="utf-8") as file:
+        content: str = file.read()
+
+    return parse_mounts_stats(content)
+
+
+def parse_mounts_stats(content: str) -> Dict[str, MountStats]:
+    """Parse NFS bytes, operations and latencies per export out of `/proc/self/mountstats`."""
+    stats: Dict[str, MountStats] = {}
+
+    # `None` while going through the lines of mounts that are not NFS.
+    current: Optional[MountStats] = None
+    in_per_op_section: bool = False
+
+    for raw_line in content.splitlines():
+        # device server:/export mounted on /mnt/data with fstype nfs4 statvers=1.1
+        if raw_line.startswith("device "):
+            fields: List[str] = raw_line.split()
+            fstype: str = fields[fields.index("fstype") + 1] if "fstype" in fields else ""
+            in_per_op_section = False
+
+            # Bind mounts repeat the counters of the export they come from, only count them once.
+            if fstype in NFS_FSTYPES and fields[1] not in stats:
+                current = stats[fields[1]] = MountStats()
+            else:
+                current = None
+            continue
+
+        if current is None:
+            continue
+
+        line = raw_line.strip()
+
+        if in_per_op_section:
+            _parse_per_op_line(line, current)
+        elif line.startswith("bytes:"):
+            # bytes: normalread normalwrite directread directwrite serverread serverwrite readpages writepages
+            byte_fields: List[str] = line.split()
+            current.bytes_read = int(byte_fields[5])
+            current.bytes_writ = int(byte_fields[6])
+        elif line == "per-op statistics":
+            in_per_op_section = True
+
+    return stats
+
+
+def compute_mount_stats_delta(new_stats: MountStats, last_stats: MountStats) -> MountStats:
+    """Compute the counters increase between two measurements of the same mount."""
+    delta = MountStats()
+
+    for field_name in MOUNT_STATS_FIELDS:
+        # Counters start over on a remount so prevent negative deltas messing up the average.
+        setattr(delta, field_name, max(0, getattr(new_stats, field_name) - getattr(last_stats, field_name)))
+
+    return delta
+
+
+def compute_mount_stats_ps(delta: MountStats, time_delta: float) -> AggregateMountStats:
+    """Compute the new stats per second and per operation latencies out of a counters delta."""
+    aggr = AggregateMountStats()
+
+    aggr.mb_read_ps = delta.bytes_read / 1e6 / time_delta
+    aggr.mb_writ_ps = delta.bytes_writ / 1e6 / time_delta
+    aggr.ops_ps = delta.ops / time_delta
+    aggr.retrans_ps = delta.retrans / time_delta
+
+    if delta.read_ops > 0:
+        aggr.read_rtt_ms = delta.read_rtt_ms / delta.read_ops
+        aggr.read_exe_ms = delta.read_exe_ms / delta.read_ops
+
+    if delta.writ_ops > 0:
+        aggr.writ_rtt_ms = delta.writ_rtt_ms / delta.writ_ops
+        aggr.writ_exe_ms = delta.writ_exe_ms / delta.writ_ops
+
+    return aggr
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MountStatsMetrics",
+    "MountStatsSnapshot",
+    "MountStats",
+    "AggregateMountStats",
+    "get_mounts_stats",
+    "parse_mounts_stats",
+]
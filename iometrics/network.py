@@ -4,6 +4,9 @@
 
 Ground truth comes from `/proc/net/dev`, a file with stats updated by the *nix kernel.
 
+Other threads should read `net.snapshot`, an immutable `NetworkSnapshot` published with a single reference
+swap at the end of each update, rather than the `AverageMetrics` being mutated by `update_stats()`.
+
 :copyright: (c) 2018 by Yaroslav Bulatov under The Unlicense <https://unlicense.org>
 :copyright: (c) 2021 by Leo Gallucci under Apache License 2.0.
 :license: Apache 2.0, see LICENSE for more details.
@@ -14,8 +17,17 @@ import time
 from dataclasses import dataclass
 from typing import Dict
 from typing import List
+from typing import Optional
+from typing import Sequence
 
 from iometrics.average_metrics import AverageMetrics
+from iometrics.average_metrics import AverageSnapshot
+from iometrics.overhead import OverheadMetrics
+from iometrics.procfs import ProcFile
+
+
+# Longest the counters of `/proc/net/dev` are expected to stay frozen while traffic flows.
+NET_DEV_REFRESH_SECS = 1.0
 
 
 @dataclass
@@ -27,35 +39,95 @@ class NetworkStats:
     bytes_sent: int = 0
 
 
+@dataclass
+class AggregateNetworkStats:
+
+    """Simple data class to store network's relevant statistics per second."""
+
+    mb_recv_ps: float = 0.0
+    mb_sent_ps: float = 0.0
+
+
+@dataclass(frozen=True)
+class NetworkSnapshot:
+
+    """Simple data class to store a consistent, immutable view of `NetworkMetrics` after one update."""
+
+    timestamp: float
+    mb_recv_ps: AverageSnapshot
+    mb_sent_ps: AverageSnapshot
+    # Fresh dicts every update, never mutated once published.
+    last_stats: Dict[str, NetworkStats]
+    per_device_stats_ps: Dict[str, AggregateNetworkStats]
+
+
 class NetworkMetrics:
 
     """Tracks and computes network received and sent MBytes/s metrics."""
 
-    # pylint: disable=too-few-public-methods
-    # One is reasonable in this case.
-
-    def __init__(self) -> None:
+    def __init__(
+        self, interfaces: Optional[Sequence[str]] = None, instrument: bool = False, net_dev_path: Optional[str] = None
+    ) -> None:
+        """Pass `instrument=True` to also record what each `update_stats` call costs in `self.overhead`."""
         self.mb_recv_ps = AverageMetrics()
         self.mb_sent_ps = AverageMetrics()
 
-        self.last_stats: Dict[str, NetworkStats] = get_network_bytes()
+        # `None` means all relevant interfaces, see `get_network_bytes`
+        self.interfaces: Optional[Sequence[str]] = interfaces
+
+        self.overhead: Optional[OverheadMetrics] = OverheadMetrics() if instrument else None
+        self._net_dev = ProcFile(net_dev_path or get_network_dev_path())
+
+        self.last_stats: Dict[str, NetworkStats] = parse_network_bytes(self._net_dev.read(), self.interfaces)
         self.last_log_time: float = time.time()
 
+        # Per-interface rates computed during the last `update_stats` call.
+        self.per_device_stats_ps: Dict[str, AggregateNetworkStats] = {}
+
+        # Replaced, never mutated, at the end of every `update_stats` call.
+        self.snapshot: NetworkSnapshot = self.freeze()
+
+    def freeze(self) -> NetworkSnapshot:
+        """Return an immutable copy of the current metrics."""
+        return NetworkSnapshot(
+            timestamp=self.last_log_time,
+            mb_recv_ps=self.mb_recv_ps.freeze(),
+            mb_sent_ps=self.mb_sent_ps.freeze(),
+            last_stats=self.last_stats,
+            per_device_stats_ps=self.per_device_stats_ps,
+        )
+
     def update_stats(self) -> None:
         """Compute metrics since last measurement then returns stats per second."""
-        time_delta: float = time.time() - self.last_log_time
+        now: float = time.time()
+        time_delta: float = now - self.last_log_time
 
-        # Important: You should wait at least 1 second between calls to the get_network_bytes function.
-        # Before ~0.9 seconds `/proc/net/dev` will show the exact same values as last the time.
-        if time_delta < 0.99:
+        # Two samples within the clock resolution would divide by zero.
+        if time_delta <= 0:
             return
 
-        new_stats: Dict[str, NetworkStats] = get_network_bytes()
+        if self.overhead is not None:
+            self.overhead.start()
+        proc_bytes_before: int = self._net_dev.bytes_read
+
+        new_stats: Dict[str, NetworkStats] = parse_network_bytes(self._net_dev.read(), self.interfaces)
+
+        # Some drivers only refresh `/proc/net/dev` about once a second, so sub-second samples would alternate
+        # between zero and a burst: wait for the counters to move, up to `NET_DEV_REFRESH_SECS` for idle links.
+        if new_stats == self.last_stats and time_delta < NET_DEV_REFRESH_SECS:
+            if self.overhead is not None:
+                self.overhead.stop(self._net_dev.bytes_read - proc_bytes_before)
+            return
 
         aggr_mb_recv_ps: float = 0.0
         aggr_mb_sent_ps: float = 0.0
+        per_device_stats_ps: Dict[str, AggregateNetworkStats] = {}
 
         for device_name, last_stats in self.last_stats.items():
+            # Interfaces like docker veths can vanish between two reads so validate key:
+            if device_name not in new_stats:
+                continue
+
             bytes_recv_delta: int = new_stats[device_name].bytes_recv - last_stats.bytes_recv
             bytes_sent_delta: int = new_stats[device_name].bytes_sent - last_stats.bytes_sent
 
@@ -68,32 +140,55 @@ class NetworkMetrics:
 
             aggr_mb_recv_ps += mb_recv_ps
             aggr_mb_sent_ps += mb_sent_ps
+            per_device_stats_ps[device_name] = AggregateNetworkStats(mb_recv_ps=mb_recv_ps, mb_sent_ps=mb_sent_ps)
 
-        self.mb_recv_ps.update(aggr_mb_recv_ps)
-        self.mb_sent_ps.update(aggr_mb_sent_ps)
+        self.mb_recv_ps.update(aggr_mb_recv_ps, time_delta)
+        self.mb_sent_ps.update(aggr_mb_sent_ps, time_delta)
 
-        self.last_log_time = time.time()
+        self.last_log_time = now
         self.last_stats = new_stats
+        self.per_device_stats_ps = per_device_stats_ps
 
+        # Publish with a single reference swap so readers never see a half-updated state.
+        self.snapshot = self.freeze()
 
-def get_network_bytes() -> Dict[str, NetworkStats]:
-    """Return received, transmitted bytes (since the kernel started)."""
-    # Important: You should wait at least 1 second between calls to this function.
-    # Before ~0.9 seconds `/proc/net/dev` will show the exact same values as last the time.
+        if self.overhead is not None:
+            self.overhead.stop(self._net_dev.bytes_read - proc_bytes_before)
 
-    interface_filter_out = re.compile(r"^(lo|tun.+|face.+|bond.+|.+\.\d+)$")
+    def close(self) -> None:
+        """Release the `/proc/net/dev` file handle."""
+        self._net_dev.close()
 
-    # Note: all counters at /proc/* are starting with zero when the kernel starts.
 
-    src_path: str = ""
+def get_network_dev_path() -> str:
+    """Return `/host/proc/net/dev` if the host's file is mounted or replicated there, else `/proc/net/dev`."""
     if os.path.exists("/host/proc/net/dev"):
-        src_path = "/host/proc/net/dev"
-    else:
-        src_path = "/proc/net/dev"
+        return "/host/proc/net/dev"
+    return "/proc/net/dev"
+
 
-    with open(src_path) as file:
+def get_network_interfaces(net_dev_path: Optional[str] = None) -> List[str]:
+    """Return the names of all the interfaces listed in `/proc/net/dev`, filtered out ones included."""
+    with open(net_dev_path or get_network_dev_path(), encoding="utf-8") as file:
+        lines: List[str] = file.read().splitlines()
+
+    # Strip the two header lines.
+    return [device_line.split(":", 1)[0].strip() for device_line in lines[2:]]
+
+
+def get_network_bytes(interfaces: Optional[Sequence[str]] = None) -> Dict[str, NetworkStats]:
+    """Return received, transmitted bytes (since the kernel started) of the given or else all relevant interfaces."""
+    # Note: all counters at /proc/* are starting with zero when the kernel starts.
+    with open(get_network_dev_path(), encoding="utf-8") as file:
         content: str = file.read()
 
+    return parse_network_bytes(content, interfaces)
+
+
+def parse_network_bytes(content: str, interfaces: Optional[Sequence[str]] = None) -> Dict[str, NetworkStats]:
+    """Parse received, transmitted bytes of the given or else all relevant interfaces out of `/proc/net/dev`."""
+    interface_filter_out = re.compile(r"^(lo|tun.+|face.+|bond.+|.+\.\d+)$")
+
     lines: List[str] = content.splitlines()
     lines = lines[2:]  # strip header
 
@@ -104,7 +199,10 @@ def get_network_bytes() -> Dict[str, NetworkStats]:
         fields: List[str] = device_line.strip().split()
         device_name: str = fields[0].strip(":")
 
-        if interface_filter_out.match(device_name):
+        if interfaces is not None:
+            if device_name not in interfaces:
+                continue
+        elif interface_filter_out.match(device_name):
             continue
 
         device_stats = NetworkStats(
@@ -122,4 +220,7 @@ def get_network_bytes() -> Dict[str, NetworkStats]:
 # reference to which interfaces are meant to be imported.
 __all__ = [
     "NetworkMetrics",
+    "NetworkSnapshot",
+    "NetworkStats",
+    "AggregateNetworkStats",
 ]
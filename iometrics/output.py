@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+## Streaming output formats for the `iometrics start` CLI.
+
+- **table** – The markdown table of `iometrics.example`, header reprinted every 15 rows.
+- **jsonl** – One JSON object per sample, ready for log shippers.
+- **csv**   – A header line then one row per sample.
+
+Each sample is rendered into a single string, written once and flushed once.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import csv
+import io
+import json
+import time
+from typing import Dict
+from typing import Optional
+from typing import TextIO
+from typing import Tuple
+
+from iometrics.disk import DiskMetrics
+from iometrics.network import NetworkMetrics
+
+
+OUTPUT_FORMATS: Tuple[str, ...] = ("table", "jsonl", "csv")
+
+# How often to reprint the table header.
+TABLE_HEADER_EVERY = 15
+
+SAMPLE_FIELDS: Tuple[str, ...] = (
+    "timestamp",
+    "net_recv_mb_ps",
+    "net_sent_mb_ps",
+    "disk_util",
+    "disk_read_mb_ps",
+    "disk_writ_mb_ps",
+    "disk_io_read_ps",
+    "disk_io_writ_ps",
+    "disk_io_wait",
+)
+
+DUAL_METRICS_HEADER = """
+|        Network (MBytes/s)       | Disk Util |            Disk MBytes          |             Disk I/O                                              |
+|     Received    |     Sent      |     %     |    MB/s Read    |  MB/s Written |     I/O Read    |   I/O Write   |     I/O Read    |   I/O Write   |
+|   val  |   avg  |  val  |  avg  | val | avg |  val   |  avg   |  val  |  avg  |   val  |   avg  |  val  |  avg  |   val  |   avg  |  val  |  avg  |
+| ------:| ------:| -----:| -----:| ---:| ---:| ------:| ------:| -----:| -----:| ------:| ------:| -----:| -----:| ------:| ------:| -----:| -----:|"""
+
+
+def format_table_row(net: NetworkMetrics, disk: DiskMetrics) -> str:
+    """Return the markdown table row of the last values and averages."""
+    return (
+        f"| {net.mb_recv_ps.val:6.1f} | {net.mb_recv_ps.avg:6.1f} "
+        f"| {net.mb_sent_ps.val:5.1f} | {net.mb_sent_ps.avg:5.1f} "
+        f"| {int(disk.io_util.val):3d} | {int(disk.io_util.avg):3d} "
+        f"| {disk.mb_read.val:6.1f} | {disk.mb_read.avg:6.1f} "
+        f"| {disk.mb_writ.val:5.1f} | {disk.mb_writ.avg:5.1f} "
+        f"| {int(disk.io_read.val):6d} | {int(disk.io_read.avg):6d} "
+        f"| {int(disk.io_writ.val):5d} | {int(disk.io_writ.avg):5d} "
+        f"| {int(disk.io_wait.val):5.1f} | {int(disk.io_wait.avg):5.1f} "
+        f"|"
+    )
+
+
+def sample_values(net: NetworkMetrics, disk: DiskMetrics, timestamp: Optional[float] = None) -> Dict[str, float]:
+    """Return the last values keyed by `SAMPLE_FIELDS`."""
+    return {
+        "timestamp": time.time() if timestamp is None else timestamp,
+        "net_recv_mb_ps": float(net.mb_recv_ps.val),
+        "net_sent_mb_ps": float(net.mb_sent_ps.val),
+        "disk_util": float(disk.io_util.val),
+        "disk_read_mb_ps": float(disk.mb_read.val),
+        "disk_writ_mb_ps": float(disk.mb_writ.val),
+        "disk_io_read_ps": float(disk.io_read.val),
+        "disk_io_writ_ps": float(disk.io_writ.val),
+        "disk_io_wait": float(disk.io_wait.val),
+    }
+
+
+class SampleWriter:
+
+    """Renders each sample in one of `OUTPUT_FORMATS` and writes it with a single write and flush."""
+
+    def __init__(self, stream: TextIO, output_format: str = "table") -> None:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format {output_format!r}, use one of {OUTPUT_FORMATS}")
+
+        self.stream = stream
+        self.output_format = output_format
+        self.rows_written: int = 0
+
+        # Reused between samples so the csv module doesn't need a new writer every time.
+        self._csv_buffer = io.StringIO()
+        self._csv_writer = csv.writer(self._csv_buffer, lineterminator="\n")
+
+    def render(self, net: NetworkMetrics, disk: DiskMetrics) -> str:
+        """Return the text of the next sample, including headers when due."""
+        if self.output_format == "table":
+            text = format_table_row(net, disk) + "\n"
+            if self.rows_written % TABLE_HEADER_EVERY == 0:
+                text = DUAL_METRICS_HEADER + "\n" + text
+            return text
+
+        values = sample_values(net, disk)
+
+        if self.output_format == "jsonl":
+            return json.dumps(values, separators=(",", ":")) + "\n"
+
+        self._csv_buffer.seek(0)
+        self._csv_buffer.truncate()
+        if self.rows_written == 0:
+            self._csv_writer.writerow(SAMPLE_FIELDS)
+        self._csv_writer.writerow([f"{values[name]:.3f}" for name in SAMPLE_FIELDS])
+        return self._csv_buffer.getvalue()
+
+    def write(self, net: NetworkMetrics, disk: DiskMetrics) -> None:
+        """Write and flush the next sample."""
+        self.stream.write(self.render(net, disk))
+        self.stream.flush()
+        self.rows_written += 1
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "SampleWriter",
+    "OUTPUT_FORMATS",
+    "SAMPLE_FIELDS",
+    "format_table_row",
+    "sample_values",
+]
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+## Classes to store Pressure Stall Information (PSI) Statistics.
+
+Ground truth comes from `/proc/pressure/{io,memory,cpu}`, files with stats updated by the *nix kernel (4.20+),
+or from `{io,memory,cpu}.pressure` inside a cgroup v2 directory to scope them to a container.
+
+- **some** – Percentage of time at least one task was stalled waiting for the resource.
+- **full** – Percentage of time all non-idle tasks were stalled at the same time.
+
+Percentages are derived from the `total=` microsecond counters over the real time between two samples
+rather than from the kernel's fixed `avg10`/`avg60` windows. Unlike iowait, which gets diluted by every idle
+core, PSI tells how much wall time is being lost to I/O.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import os
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import ClassVar
+from typing import Dict
+from typing import Optional
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.metric_source import MetricSource
+from iometrics.procfs import ProcFile
+
+
+PSI_RESOURCES: Tuple[str, ...] = ("io", "memory", "cpu")
+PSI_METRICS: Tuple[str, ...] = tuple(f"{resource}_{kind}" for resource in PSI_RESOURCES for kind in ("some", "full"))
+PSI_SCOPES: Tuple[str, ...] = ("system", "cgroup")
+
+
+@dataclass
+class PressureStats:
+
+    """Simple data class to store stall time counters in microseconds."""
+
+    io_some_us: int = 0
+    io_full_us: int = 0
+    memory_some_us: int = 0
+    memory_full_us: int = 0
+    cpu_some_us: int = 0
+    cpu_full_us: int = 0
+
+
+class PressureMetrics(MetricSource):
+
+    """Tracks and computes io, memory and cpu "some" and "full" stall percentages.
+
+    `scope="cgroup"` reads the PSI files of the cgroup of this process, `cgroup_path` any other cgroup v2 directory.
+    """
+
+    # Stalled microseconds per second times 1e-4 is the percentage of wall time stalled.
+    RATES: ClassVar[Dict[str, Tuple[str, float]]] = {
+        metric_name: (f"{metric_name}_us", 1e-4) for metric_name in PSI_METRICS
+    }
+
+    def __init__(self, cgroup_path: Optional[str] = None, scope: str = "system") -> None:
+        if scope not in PSI_SCOPES:
+            raise ValueError(f"Unknown pressure scope {scope!r}, use one of {list(PSI_SCOPES)}")
+        if scope == "cgroup" and cgroup_path is None:
+            cgroup_path = get_own_cgroup_path()
+            if cgroup_path is None:
+                raise ValueError("This process is not in a cgroup v2 (unified) hierarchy, use scope='system'")
+
+        # Kernels without PSI (or with `psi=0`) simply don't have the files, report zeros for those.
+        self._files: Dict[str, ProcFile] = {}
+        for resource in PSI_RESOURCES:
+            path = get_pressure_path(resource, cgroup_path)
+            if os.path.exists(path):
+                self._files[resource] = ProcFile(path)
+
+        super().__init__()
+
+        self.io_some: AverageMetrics = self.metrics["io_some"]
+        self.io_full: AverageMetrics = self.metrics["io_full"]
+        self.memory_some: AverageMetrics = self.metrics["memory_some"]
+        self.memory_full: AverageMetrics = self.metrics["memory_full"]
+        self.cpu_some: AverageMetrics = self.metrics["cpu_some"]
+        self.cpu_full: AverageMetrics = self.metrics["cpu_full"]
+
+    @property
+    def available(self) -> bool:
+        """Return whether this kernel exposes any PSI file."""
+        return bool(self._files)
+
+    def get_pressure_stats(self) -> PressureStats:
+        """Return the stall time counters (since the kernel started or the cgroup was created)."""
+        stats = PressureStats()
+
+        for resource, proc_file in self._files.items():
+            some_us, full_us = parse_pressure_totals(proc_file.read())
+            setattr(stats, f"{resource}_some_us", some_us)
+            setattr(stats, f"{resource}_full_us", full_us)
+
+        return stats
+
+    def read(self) -> Dict[str, float]:
+        """Return the stall time counters keyed by counter name, e.g. `io_some_us`."""
+        return {counter_name: float(total_us) for counter_name, total_us in asdict(self.get_pressure_stats()).items()}
+
+    def derive(self, new_stats: Dict[str, float], time_delta: float) -> Dict[str, float]:
+        """Return the stall percentages, capped at 100%."""
+        return {
+            metric_name: min(100.0, stall_percent)
+            for metric_name, stall_percent in super().derive(new_stats, time_delta).items()
+        }
+
+    def close(self) -> None:
+        """Release the PSI file handles."""
+        for proc_file in self._files.values():
+            proc_file.close()
+
+
+def get_pressure_path(resource: str, cgroup_path: Optional[str] = None) -> str:
+    """Return the system wide PSI file of `resource` or the one of a cgroup v2 directory."""
+    if cgroup_path is None:
+        return f"/proc/pressure/{resource}"
+    return os.path.join(cgroup_path, f"{resource}.pressure")
+
+
+def get_own_cgroup_path(
+    cgroup_root: str = "/sys/fs/cgroup", proc_cgroup_path: str = "/proc/self/cgroup"
+) -> Optional[str]:
+    """Return the cgroup v2 directory of the current process, `None` when not on a cgroup v2 (unified) hierarchy."""
+    with open(proc_cgroup_path, encoding="utf-8") as file:
+        for line in file:
+            # cgroup v2 entries look like `0::/system.slice/train.service`
+            if line.startswith("0::"):
+                return os.path.normpath(os.path.join(cgroup_root, line[3:].strip().lstrip("/")))
+    return None
+
+
+def parse_pressure_totals(content: str) -> Tuple[int, int]:
+    """Return the `some` and `full` total stall microseconds of a PSI file."""
+    # some avg10=0.00 avg60=0.00 avg300=0.00 total=1500121
+    # full avg10=0.00 avg60=0.00 avg300=0.00 total=1380483
+    totals: Dict[str, int] = {"some": 0, "full": 0}
+
+    for line in content.splitlines():
+        kind, _, rest = line.partition(" ")
+        _, _, total = rest.rpartition(" total=")
+        if kind in totals and total:
+            totals[kind] = int(total)
+
+    return totals["some"], totals["full"]
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "PressureMetrics",
+    "PressureStats",
+    "get_own_cgroup_path",
+]
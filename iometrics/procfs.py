@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+## Persistent `/proc` file handles.
+
+Opening a `/proc` file on every sample costs a path lookup plus an open/close syscall pair.
+The kernel regenerates the content of these files on each read from offset zero,
+so keeping the handle open and seeking back to the start is enough.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+from typing import Any
+from typing import ClassVar
+from typing import Optional
+from typing import TextIO
+
+
+class ProcFile:
+
+    """Keeps a `/proc` file open and re-reads its whole content from the start on each `read()`."""
+
+    # Characters read by all the instances in this process, e.g. to tell them apart from the I/O being measured.
+    total_bytes_read: ClassVar[int] = 0
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Total characters read so far, handy to measure how much work sampling is.
+        self.bytes_read: int = 0
+        self._file: Optional[TextIO] = None
+
+    def read(self) -> str:
+        """Return the current content of the file."""
+        if self._file is None:
+            self._file = open(self.path, encoding="utf-8")  # pylint: disable=consider-using-with
+        self._file.seek(0)
+        content: str = self._file.read()
+        self.bytes_read += len(content)
+        ProcFile.total_bytes_read += len(content)
+        return content
+
+    def close(self) -> None:
+        """Release the file handle, a later `read()` opens it again."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> "ProcFile":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "ProcFile",
+]
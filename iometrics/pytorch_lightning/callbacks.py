@@ -11,6 +11,7 @@ import time
 from typing import Any
 from typing import Dict
 from typing import Optional
+from typing import Sequence
 
 import pytorch_lightning as pl
 from pytorch_lightning.callbacks.base import Callback
@@ -20,7 +21,17 @@ from pytorch_lightning.utilities.parsing import AttributeDict
 from pytorch_lightning.utilities.types import STEP_OUTPUT
 
 from iometrics import DiskMetrics
+from iometrics import MemoryIOMetrics
+from iometrics import MountStatsMetrics
 from iometrics import NetworkMetrics
+from iometrics import PressureMetrics
+from iometrics.alerts import AlertEngine
+from iometrics.alerts import AlertRule
+from iometrics.average_metrics import get_average_metrics
+from iometrics.overhead import OverheadMetrics
+from iometrics.pressure import PSI_SCOPES
+from iometrics.sources import get_source
+from iometrics.tracing import TracingMetrics
 
 
 # How often to fetch metrics
@@ -35,6 +46,35 @@ LOG_KEY_DISK_MB_WRIT = "disk/writ_MB_per_sec"
 LOG_KEY_DISK_IO_READ = "disk/io_read_count_per_sec"
 LOG_KEY_DISK_IO_WRIT = "disk/io_writ_count_per_sec"
 LOG_KEY_DISK_IO_WAIT = "disk/io_wait%"
+LOG_KEY_NFS_MB_READ = "nfs/read_MB_per_sec"
+LOG_KEY_NFS_MB_WRIT = "nfs/writ_MB_per_sec"
+LOG_KEY_NFS_OPS = "nfs/ops_per_sec"
+LOG_KEY_NFS_RETRANS = "nfs/retrans_per_sec"
+LOG_KEY_NFS_READ_RTT = "nfs/read_rtt_ms"
+LOG_KEY_NFS_READ_EXE = "nfs/read_exe_ms"
+LOG_KEY_NFS_WRIT_RTT = "nfs/writ_rtt_ms"
+LOG_KEY_NFS_WRIT_EXE = "nfs/writ_exe_ms"
+LOG_KEY_MEM_MB_PGIN = "memory/pgpgin_MB_per_sec"
+LOG_KEY_MEM_MB_PGOUT = "memory/pgpgout_MB_per_sec"
+LOG_KEY_MEM_MAJOR_FAULTS = "memory/major_faults_per_sec"
+LOG_KEY_MEM_READ_HIT = "memory/read_cache_hit%"
+LOG_KEY_MEM_MB_CACHED = "memory/cached_MB"
+LOG_KEY_MEM_MB_DIRTY = "memory/dirty_MB"
+LOG_KEY_MEM_MB_WRITEBACK = "memory/writeback_MB"
+LOG_KEY_PSI_IO_SOME = "pressure/io_some%"
+LOG_KEY_PSI_IO_FULL = "pressure/io_full%"
+LOG_KEY_PSI_MEMORY_SOME = "pressure/memory_some%"
+LOG_KEY_PSI_MEMORY_FULL = "pressure/memory_full%"
+LOG_KEY_PSI_CPU_SOME = "pressure/cpu_some%"
+LOG_KEY_PSI_CPU_FULL = "pressure/cpu_full%"
+# Followed by the rule name, e.g. "alerts/disk_saturated"
+LOG_KEY_ALERT_PREFIX = "alerts/"
+LOG_KEY_OVERHEAD_US = "iometrics/overhead_us"
+LOG_KEY_OVERHEAD_CPU_US = "iometrics/overhead_cpu_us"
+LOG_KEY_OVERHEAD_PROC_BYTES = "iometrics/overhead_proc_bytes"
+LOG_KEY_OVERHEAD_NET_ALLOCATED_BLOCKS = "iometrics/overhead_net_allocated_blocks"
+# Followed by the tag then the metric, e.g. "trace/shards/read_MB_per_sec"
+LOG_KEY_TRACE_PREFIX = "trace/"
 
 
 class NetworkAndDiskStatsMonitor(Callback):
@@ -49,6 +89,23 @@ class NetworkAndDiskStatsMonitor(Callback):
             at the start and end of each step. Default: ``True``.
         track_disk_utilization: Set to ``True`` to monitor Disk read, write, IO/s and percentage of Disk utilization.
             at the start and end of each step. Default: ``True``.
+        track_nfs_utilization: Set to ``True`` to monitor NFS client MB/s, operations/s, retransmissions and latencies
+            at the start and end of each step. Default: ``False``.
+        track_memory_io: Set to ``True`` to monitor paging MB/s, major faults, page cache and dirty/writeback sizes
+            at the start and end of each step. Default: ``False``.
+        track_pressure: Set to ``True`` to monitor io, memory and cpu Pressure Stall Information (Linux 4.20+)
+            at the start and end of each step. Default: ``False``.
+        alert_rules: ``AlertRule``s evaluated right after each collection against the tracked meters, named
+            ``"net"``, ``"disk"``, ``"nfs"``, ``"memory"``, ``"pressure"`` and ``"trace"``, e.g. ``"disk.io_util"``.
+            Default: ``None``.
+        track_overhead: Set to ``True`` to log what collecting all the other metrics costs in wall and CPU time,
+            ``/proc`` bytes read and memory blocks growth. Default: ``False``.
+        track_io_tracing: Set to ``True`` to log the bytes, calls and latency counted per tag by the
+            ``iometrics.tracing`` wrappers at the start and end of each step. Default: ``False``.
+        sources: Names of more sources registered in ``iometrics.sources``, e.g. ``["process"]``, each metric
+            logged as ``"<source>/<metric>"`` and usable by ``alert_rules``. Default: ``None``.
+        pressure_scope: ``"system"`` for the host wide Pressure Stall Information or ``"cgroup"`` for the one
+            of the cgroup (container) this process runs in. Default: ``"system"``.
 
     Example::
 
@@ -67,6 +124,35 @@ class NetworkAndDiskStatsMonitor(Callback):
     - **LOG_KEY_DISK_IO_READ**    – Disks read I/O operations per second    as the sum of all disk devices.
     - **LOG_KEY_DISK_IO_WRIT**    – Disks written I/O operations per second as the sum of all disk devices.
     - **LOG_KEY_DISK_IO_WAIT**    – Disks I/O percentage of time that the CPU is waiting.
+    - **LOG_KEY_NFS_MB_READ**     – NFS read MB/s    as the sum of all NFS mounts.
+    - **LOG_KEY_NFS_MB_WRIT**     – NFS written MB/s as the sum of all NFS mounts.
+    - **LOG_KEY_NFS_OPS**         – NFS operations per second as the sum of all NFS mounts.
+    - **LOG_KEY_NFS_RETRANS**     – NFS RPC retransmissions per second as the sum of all NFS mounts.
+    - **LOG_KEY_NFS_READ_RTT**    – NFS average READ round trip time in milliseconds.
+    - **LOG_KEY_NFS_READ_EXE**    – NFS average READ execution time (queue + RTT) in milliseconds.
+    - **LOG_KEY_NFS_WRIT_RTT**    – NFS average WRITE round trip time in milliseconds.
+    - **LOG_KEY_NFS_WRIT_EXE**    – NFS average WRITE execution time (queue + RTT) in milliseconds.
+    - **LOG_KEY_MEM_MB_PGIN**     – MB/s paged in from block devices.
+    - **LOG_KEY_MEM_MB_PGOUT**    – MB/s paged out to block devices.
+    - **LOG_KEY_MEM_MAJOR_FAULTS** – Major page faults per second, i.e. the ones that had to go to disk.
+    - **LOG_KEY_MEM_READ_HIT**    – Percentage of the bytes read by this process served from the page cache,
+      only logged when it read something.
+    - **LOG_KEY_MEM_MB_CACHED**   – MB in the page cache.
+    - **LOG_KEY_MEM_MB_DIRTY**    – MB of dirty pages waiting to be written back.
+    - **LOG_KEY_MEM_MB_WRITEBACK** – MB of pages being written back right now.
+    - **LOG_KEY_PSI_IO_SOME**     – Percentage of time at least one task was stalled on I/O.
+    - **LOG_KEY_PSI_IO_FULL**     – Percentage of time all non-idle tasks were stalled on I/O.
+    - **LOG_KEY_PSI_MEMORY_SOME** – Percentage of time at least one task was stalled on memory.
+    - **LOG_KEY_PSI_MEMORY_FULL** – Percentage of time all non-idle tasks were stalled on memory.
+    - **LOG_KEY_PSI_CPU_SOME**    – Percentage of time at least one runnable task was waiting for a CPU.
+    - **LOG_KEY_PSI_CPU_FULL**    – Percentage of time all non-idle tasks were waiting for a CPU.
+    - **LOG_KEY_ALERT_PREFIX**    – Followed by each alert rule name: 1.0 while the rule is firing, 0.0 otherwise.
+    - **LOG_KEY_OVERHEAD_US**     – Wall clock microseconds the last collection of metrics took.
+    - **LOG_KEY_OVERHEAD_CPU_US** – CPU microseconds the last collection of metrics took.
+    - **LOG_KEY_OVERHEAD_PROC_BYTES** – Bytes read from ``/proc`` by the Network and Disk meters in the last collection.
+    - **LOG_KEY_OVERHEAD_NET_ALLOCATED_BLOCKS** – Growth of the interpreter memory blocks during the last collection.
+    - **LOG_KEY_TRACE_PREFIX**    – Followed by each traced tag then ``read_MB_per_sec``, ``writ_MB_per_sec``,
+      ``calls_per_sec`` and ``latency_ms`` (average per call).
 
     Raises
     ------
@@ -79,43 +165,99 @@ class NetworkAndDiskStatsMonitor(Callback):
         self,
         track_network_utilization: bool = True,
         track_disk_utilization: bool = True,
+        track_nfs_utilization: bool = False,
+        track_memory_io: bool = False,
+        track_pressure: bool = False,
+        alert_rules: Optional[Sequence[AlertRule]] = None,
+        track_overhead: bool = False,
+        track_io_tracing: bool = False,
+        sources: Optional[Sequence[str]] = None,
+        pressure_scope: str = "system",
     ):
         super().__init__()
 
+        if pressure_scope not in PSI_SCOPES:
+            raise MisconfigurationException(f"Unknown pressure_scope {pressure_scope!r}, use one of {list(PSI_SCOPES)}")
+
         # AttributeDict is a subclass of dict that allows to access keys as attributes using dot notation.
         self._settings = AttributeDict(
             {
                 "track_network_utilization": track_network_utilization,
                 "track_disk_utilization": track_disk_utilization,
+                "track_nfs_utilization": track_nfs_utilization,
+                "track_memory_io": track_memory_io,
+                "track_pressure": track_pressure,
+                "alert_rules": list(alert_rules or []),
+                "track_overhead": track_overhead,
+                "track_io_tracing": track_io_tracing,
+                "sources": list(sources or []),
+                "pressure_scope": pressure_scope,
             }
         )
 
+        # Created in `setup()` and kept across epochs, so alert rules keep their pending and cooldown state.
+        self._net_meter: Any[NetworkMetrics, None] = None
+        self._disk_meter: Any[DiskMetrics, None] = None
+        self._nfs_meter: Any[MountStatsMetrics, None] = None
+        self._mem_meter: Any[MemoryIOMetrics, None] = None
+        self._psi_meter: Any[PressureMetrics, None] = None
+        self._alert_engine: Any[AlertEngine, None] = None
+        self._overhead_meter: Any[OverheadMetrics, None] = None
+        self._source_meters: Any[Dict[str, Any], None] = None
+        self._trace_meter: Any[TracingMetrics, None] = None
+
     def setup(self, trainer: "pl.Trainer", pl_module: "pl.LightningModule", stage: Optional[str] = None) -> None:
         if not trainer.logger:
             raise MisconfigurationException(
                 "Cannot use NetworkAndDiskStatsMonitor callback with Trainer that has no logger."
             )
 
-    def on_train_epoch_start(self, trainer: "pl.Trainer", pl_module: "pl.LightningModule") -> None:
-        self._net_meter: Any[NetworkMetrics, None] = None
-        self._disk_meter: Any[DiskMetrics, None] = None
+        # Fail before training starts rather than on the first logged batch, e.g. on a malformed alert rule.
+        try:
+            self._create_meters()
+        except ValueError as error:
+            raise MisconfigurationException(f"NetworkAndDiskStatsMonitor: {error}") from error
 
+    def on_train_epoch_start(self, trainer: "pl.Trainer", pl_module: "pl.LightningModule") -> None:
         # Also track time to make sure we don't fetch metrics too often.
         self._time_tracker: float = time.time()
 
+    def _create_meters(self) -> None:
+        # Only the ones still missing, alert rules are compiled last against the other meters.
+        if self._settings.track_overhead and self._overhead_meter is None:
+            self._overhead_meter = OverheadMetrics()
+        if self._settings.track_network_utilization and self._net_meter is None:
+            self._net_meter = NetworkMetrics(instrument=self._settings.track_overhead)
+        if self._settings.track_disk_utilization and self._disk_meter is None:
+            self._disk_meter = DiskMetrics(instrument=self._settings.track_overhead)
+        if self._settings.track_nfs_utilization and self._nfs_meter is None:
+            self._nfs_meter = MountStatsMetrics()
+        if self._settings.track_memory_io and self._mem_meter is None:
+            self._mem_meter = MemoryIOMetrics()
+        if self._settings.track_pressure and self._psi_meter is None:
+            self._psi_meter = PressureMetrics(scope=self._settings.pressure_scope)
+        if self._settings.track_io_tracing and self._trace_meter is None:
+            self._trace_meter = TracingMetrics()
+        if self._settings.sources and self._source_meters is None:
+            self._source_meters = {name: get_source(name) for name in self._settings.sources}
+        if self._settings.alert_rules and self._alert_engine is None:
+            self._alert_engine = AlertEngine(self._settings.alert_rules, self._get_alert_sources())
+
     def _get_new_logs(self) -> Dict[str, float]:
+        self._create_meters()
         new_logs: Dict[str, float] = {}
 
+        proc_bytes_before: float = 0.0
+        if self._settings.track_overhead:
+            self._overhead_meter.start()
+            proc_bytes_before = self._get_proc_bytes_read()
+
         if self._settings.track_network_utilization:
-            if not hasattr(self, "_net_meter") or self._net_meter is None:
-                self._net_meter = NetworkMetrics()
             self._net_meter.update_stats()
             new_logs[LOG_KEY_NETW_BYTES_RECV] = float(self._net_meter.mb_recv_ps.val)
             new_logs[LOG_KEY_NETW_BYTES_SENT] = float(self._net_meter.mb_sent_ps.val)
 
         if self._settings.track_disk_utilization:
-            if not hasattr(self, "_disk_meter") or self._disk_meter is None:
-                self._disk_meter = DiskMetrics()
             self._disk_meter.update_stats()
             new_logs[LOG_KEY_DISK_UTIL] = float(self._disk_meter.io_util.val)
             new_logs[LOG_KEY_DISK_MB_READ] = float(self._disk_meter.mb_read.val)
@@ -124,8 +266,85 @@ class NetworkAndDiskStatsMonitor(Callback):
             new_logs[LOG_KEY_DISK_IO_WRIT] = float(self._disk_meter.io_writ.val)
             new_logs[LOG_KEY_DISK_IO_WAIT] = float(self._disk_meter.io_wait.val)
 
+        if self._settings.track_nfs_utilization:
+            self._nfs_meter.update_stats()
+            new_logs[LOG_KEY_NFS_MB_READ] = float(self._nfs_meter.mb_read.val)
+            new_logs[LOG_KEY_NFS_MB_WRIT] = float(self._nfs_meter.mb_writ.val)
+            new_logs[LOG_KEY_NFS_OPS] = float(self._nfs_meter.ops.val)
+            new_logs[LOG_KEY_NFS_RETRANS] = float(self._nfs_meter.retrans.val)
+            new_logs[LOG_KEY_NFS_READ_RTT] = float(self._nfs_meter.read_rtt_ms.val)
+            new_logs[LOG_KEY_NFS_READ_EXE] = float(self._nfs_meter.read_exe_ms.val)
+            new_logs[LOG_KEY_NFS_WRIT_RTT] = float(self._nfs_meter.writ_rtt_ms.val)
+            new_logs[LOG_KEY_NFS_WRIT_EXE] = float(self._nfs_meter.writ_exe_ms.val)
+
+        if self._settings.track_memory_io:
+            self._mem_meter.update_stats()
+            new_logs[LOG_KEY_MEM_MB_PGIN] = float(self._mem_meter.mb_pgin.val)
+            new_logs[LOG_KEY_MEM_MB_PGOUT] = float(self._mem_meter.mb_pgout.val)
+            new_logs[LOG_KEY_MEM_MAJOR_FAULTS] = float(self._mem_meter.major_faults.val)
+            if self._mem_meter.last_read_hit is not None:
+                new_logs[LOG_KEY_MEM_READ_HIT] = float(self._mem_meter.last_read_hit)
+            new_logs[LOG_KEY_MEM_MB_CACHED] = float(self._mem_meter.mb_cached.val)
+            new_logs[LOG_KEY_MEM_MB_DIRTY] = float(self._mem_meter.mb_dirty.val)
+            new_logs[LOG_KEY_MEM_MB_WRITEBACK] = float(self._mem_meter.mb_writeback.val)
+
+        if self._settings.track_pressure:
+            self._psi_meter.update_stats()
+            new_logs[LOG_KEY_PSI_IO_SOME] = float(self._psi_meter.io_some.val)
+            new_logs[LOG_KEY_PSI_IO_FULL] = float(self._psi_meter.io_full.val)
+            new_logs[LOG_KEY_PSI_MEMORY_SOME] = float(self._psi_meter.memory_some.val)
+            new_logs[LOG_KEY_PSI_MEMORY_FULL] = float(self._psi_meter.memory_full.val)
+            new_logs[LOG_KEY_PSI_CPU_SOME] = float(self._psi_meter.cpu_some.val)
+            new_logs[LOG_KEY_PSI_CPU_FULL] = float(self._psi_meter.cpu_full.val)
+
+        if self._settings.track_io_tracing:
+            self._trace_meter.update_stats()
+            for tag, stats in self._trace_meter.per_tag_stats_ps.items():
+                new_logs[f"{LOG_KEY_TRACE_PREFIX}{tag}/read_MB_per_sec"] = float(stats.mb_read_ps)
+                new_logs[f"{LOG_KEY_TRACE_PREFIX}{tag}/writ_MB_per_sec"] = float(stats.mb_writ_ps)
+                new_logs[f"{LOG_KEY_TRACE_PREFIX}{tag}/calls_per_sec"] = float(stats.calls_ps)
+                new_logs[f"{LOG_KEY_TRACE_PREFIX}{tag}/latency_ms"] = float(stats.latency_ms)
+
+        if self._settings.sources:
+            for source_name, meter in self._source_meters.items():
+                meter.update_stats()
+                for metric_name, metric in get_average_metrics(meter).items():
+                    new_logs[f"{source_name}/{metric_name}"] = float(metric.val)
+
+        if self._settings.alert_rules:
+            self._alert_engine.evaluate()
+            for rule_name, firing in self._alert_engine.firing().items():
+                new_logs[f"{LOG_KEY_ALERT_PREFIX}{rule_name}"] = float(firing)
+
+        if self._settings.track_overhead:
+            self._overhead_meter.stop(int(self._get_proc_bytes_read() - proc_bytes_before))
+            new_logs[LOG_KEY_OVERHEAD_US] = float(self._overhead_meter.wall_us.val)
+            new_logs[LOG_KEY_OVERHEAD_CPU_US] = float(self._overhead_meter.cpu_us.val)
+            new_logs[LOG_KEY_OVERHEAD_PROC_BYTES] = float(self._overhead_meter.proc_bytes.val)
+            new_logs[LOG_KEY_OVERHEAD_NET_ALLOCATED_BLOCKS] = float(self._overhead_meter.net_allocated_blocks.val)
+
         return new_logs
 
+    def _get_proc_bytes_read(self) -> float:
+        # Total so far of the instrumented meters, their `tot_sum` only grows.
+        total: float = 0.0
+        for meter in (self._net_meter, self._disk_meter):
+            if meter is not None and meter.overhead is not None:
+                total += meter.overhead.proc_bytes.tot_sum
+        return total
+
+    def _get_alert_sources(self) -> Dict[str, Any]:
+        meters = {
+            "net": self._net_meter,
+            "disk": self._disk_meter,
+            "nfs": self._nfs_meter,
+            "memory": self._mem_meter,
+            "pressure": self._psi_meter,
+            "trace": self._trace_meter,
+        }
+        meters.update(self._source_meters or {})
+        return {name: meter for name, meter in meters.items() if meter is not None}
+
     @rank_zero_only
     def on_train_batch_start(
         self,
@@ -180,4 +399,31 @@ __all__ = [
     "LOG_KEY_DISK_MB_WRIT",
     "LOG_KEY_DISK_IO_READ",
     "LOG_KEY_DISK_IO_WRIT",
+    "LOG_KEY_NFS_MB_READ",
+    "LOG_KEY_NFS_MB_WRIT",
+    "LOG_KEY_NFS_OPS",
+    "LOG_KEY_NFS_RETRANS",
+    "LOG_KEY_NFS_READ_RTT",
+    "LOG_KEY_NFS_READ_EXE",
+    "LOG_KEY_NFS_WRIT_RTT",
+    "LOG_KEY_NFS_WRIT_EXE",
+    "LOG_KEY_MEM_MB_PGIN",
+    "LOG_KEY_MEM_MB_PGOUT",
+    "LOG_KEY_MEM_MAJOR_FAULTS",
+    "LOG_KEY_MEM_READ_HIT",
+    "LOG_KEY_MEM_MB_CACHED",
+    "LOG_KEY_MEM_MB_DIRTY",
+    "LOG_KEY_MEM_MB_WRITEBACK",
+    "LOG_KEY_PSI_IO_SOME",
+    "LOG_KEY_PSI_IO_FULL",
+    "LOG_KEY_PSI_MEMORY_SOME",
+    "LOG_KEY_PSI_MEMORY_FULL",
+    "LOG_KEY_PSI_CPU_SOME",
+    "LOG_KEY_PSI_CPU_FULL",
+    "LOG_KEY_ALERT_PREFIX",
+    "LOG_KEY_OVERHEAD_US",
+    "LOG_KEY_OVERHEAD_CPU_US",
+    "LOG_KEY_OVERHEAD_PROC_BYTES",
+    "LOG_KEY_OVERHEAD_NET_ALLOCATED_BLOCKS",
+    "LOG_KEY_TRACE_PREFIX",
 ]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+## Background sampler.
+
+Periodically calls `update_stats()` on a group of meters from a daemon thread and notifies listeners
+every time a new sample lands.
+
+```py
+from iometrics import DiskMetrics, NetworkMetrics
+from iometrics.sampler import MetricsSampler
+
+sampler = MetricsSampler([NetworkMetrics(), DiskMetrics()], interval_secs=1.0)
+sampler.add_listener(lambda: print("new sample"))
+sampler.start()
+```
+
+### Adaptive sampling
+
+`AdaptiveSampler` shortens the interval (down to `min_interval_secs`) while MB/s counters keep moving and backs off
+(up to `max_interval_secs`) while the host is idle. Meters weight their averages by the seconds each sample covers
+so `avg` stays a proper time average whatever the cadence.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import logging
+import threading
+import time
+from typing import Any
+from typing import Callable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+
+
+logger = logging.getLogger(__name__)
+
+# Meter attributes that tell how busy the host is, in MB/s.
+ACTIVITY_METRICS: Tuple[str, ...] = ("mb_read", "mb_writ", "mb_recv_ps", "mb_sent_ps")
+
+
+def iter_ticks(interval_secs: float, count: Optional[int] = None) -> Iterator[int]:
+    """Sleep until each multiple of `interval_secs` since the first call then yield how many ticks were yielded before.
+
+    Deadlines are computed from the start time rather than from the end of the previous tick so the time spent
+    sampling and writing doesn't accumulate as drift. Ticks missed because a sample took too long are skipped.
+    """
+    start: float = time.monotonic()
+    tick: int = 0
+    yielded: int = 0
+
+    while count is None or yielded < count:
+        tick += 1
+        deadline: float = start + tick * interval_secs
+        now: float = time.monotonic()
+
+        if now > deadline:
+            # Overran one or more intervals, realign to the next one instead of bursting to catch up.
+            tick = int((now - start) // interval_secs) + 1
+            deadline = start + tick * interval_secs
+
+        time.sleep(deadline - now)
+        yield yielded
+        yielded += 1
+
+
+class MetricsSampler:
+
+    """Runs `update_stats()` of every meter each `interval_secs` in a background daemon thread."""
+
+    def __init__(self, meters: Sequence[Any], interval_secs: float = 1.0) -> None:
+        self.meters: List[Any] = list(meters)
+        self.interval_secs = interval_secs
+
+        # Samples per second actually achieved, its `avg` is time-weighted so it equals samples / elapsed seconds.
+        self.sample_rate_hz = AverageMetrics()
+        self._last_sample_time: float = time.time()
+        # Samples that raised, logged and skipped rather than ending the background thread.
+        self.failed_samples: int = 0
+
+        self._listeners: List[Callable[[], None]] = []
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="iometrics-sampler", daemon=True)
+
+    def add_listener(self, listener: Callable[[], None]) -> None:
+        """Register a function called (from the sampler thread) right after each sample."""
+        self._listeners.append(listener)
+
+    def update_meters(self) -> None:
+        """Call `update_stats()` of every meter."""
+        for meter in self.meters:
+            meter.update_stats()
+
+    def sample(self) -> None:
+        """Update all meters once and notify the listeners."""
+        self.update_meters()
+
+        now: float = time.time()
+        elapsed: float = now - self._last_sample_time
+        if elapsed > 0:
+            self.sample_rate_hz.update(1.0 / elapsed, elapsed)
+        self._last_sample_time = now
+
+        for listener in self._listeners:
+            listener()
+
+    def next_interval(self) -> float:
+        """Return how many seconds to wait before the next sample."""
+        return self.interval_secs
+
+    def start(self) -> None:
+        """Start sampling in the background."""
+        self._last_sample_time = time.time()
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask the background thread to finish and wait for it."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        # `Event.wait` returns True as soon as `stop()` is called so we don't wait a full interval.
+        while not self._stop_event.wait(self.next_interval()):
+            try:
+                self.sample()
+            except Exception:  # pylint: disable=broad-except
+                # One bad sample, e.g. an interface removed between two reads, must not stop sampling for good.
+                self.failed_samples += 1
+                logger.exception("Sampling failed, retrying on the next tick")
+
+
+class AdaptiveSampler(MetricsSampler):
+
+    """Samples faster during I/O bursts and backs off while idle, between `min_interval_secs` and `max_interval_secs`."""
+
+    def __init__(
+        self,
+        meters: Sequence[Any],
+        min_interval_secs: float = 0.25,
+        max_interval_secs: float = 10.0,
+        busy_mb_ps: float = 1.0,
+        backoff_factor: float = 1.5,
+    ) -> None:
+        if not 0 < min_interval_secs <= max_interval_secs:
+            raise ValueError("Expected 0 < min_interval_secs <= max_interval_secs")
+
+        super().__init__(meters, interval_secs=min_interval_secs)
+
+        self.min_interval_secs = min_interval_secs
+        self.max_interval_secs = max_interval_secs
+        self.busy_mb_ps = busy_mb_ps
+        self.backoff_factor = backoff_factor
+
+    def activity(self) -> float:
+        """Return the MB/s moved during the last sample summed over all meters."""
+        total: float = 0.0
+        for meter in self.meters:
+            for metric_name in ACTIVITY_METRICS:
+                metric = getattr(meter, metric_name, None)
+                if isinstance(metric, AverageMetrics):
+                    total += metric.val
+        return total
+
+    def next_interval(self) -> float:
+        """Halve the interval while busy, grow it by `backoff_factor` while idle."""
+        if self.activity() >= self.busy_mb_ps:
+            self.interval_secs = max(self.min_interval_secs, self.interval_secs / 2)
+        else:
+            self.interval_secs = min(self.max_interval_secs, self.interval_secs * self.backoff_factor)
+        return self.interval_secs
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MetricsSampler",
+    "AdaptiveSampler",
+    "iter_ticks",
+]
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+## Pluggable metric sources.
+
+A new counter only needs a `MetricSource` subclass that reads raw counters and declares which of them are
+rates and which are gauges. The base class takes care of the deltas, the negative delta clamping,
+the per second rates and the `AverageMetrics` of `source.metrics`, and registered sources are picked up by name
+by `SourceScheduler`, `MetricsExporter(sources=...)` and `NetworkAndDiskStatsMonitor(sources=...)`.
+
+```py
+from iometrics.sources import MetricSource, SourceScheduler, register_source
+
+@register_source("process")
+class ProcessIOSource(MetricSource):
+    RATES = {"mb_read": ("read_bytes", 1e-6)}
+
+    def read(self):
+        ...  # {"read_bytes": 123}
+
+scheduler = SourceScheduler.from_names(["disk", "net", "process"], interval_secs=1.0)
+scheduler.start()
+```
+
+The built-in meters are registered as `"net"`, `"disk"`, `"nfs"`, `"memory"`, `"pressure"`, `"trace"`
+(see `iometrics.tracing`) and `"process"`. `"memory"`, `"pressure"` and `"process"` are `MetricSource`s,
+the others keep per device, export or tag state and only follow the same `update_stats()` contract.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import time
+from typing import Any
+from typing import Callable
+from typing import ClassVar
+from typing import Dict
+from typing import List
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.disk import DiskMetrics
+from iometrics.memory import MemoryIOMetrics
+from iometrics.memory import parse_key_values
+from iometrics.metric_source import MetricSource
+from iometrics.mountstats import MountStatsMetrics
+from iometrics.network import NetworkMetrics
+from iometrics.pressure import PressureMetrics
+from iometrics.procfs import ProcFile
+from iometrics.sampler import MetricsSampler
+from iometrics.tracing import TracingMetrics
+
+
+# Name to factory of every registered source, the factory returns a meter: an object with `update_stats()`
+# and `AverageMetrics`, either as attributes or in a `metrics` mapping.
+SOURCES: Dict[str, Callable[..., Any]] = {}
+
+
+def register_source(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """Register a source class or factory under `name`, to be used as a decorator."""
+
+    def decorator(factory: Callable[..., Any]) -> Callable[..., Any]:
+        if name in SOURCES:
+            raise ValueError(f"A metric source named {name!r} is already registered")
+        SOURCES[name] = factory
+        return factory
+
+    return decorator
+
+
+def get_source(name: str, **kwargs: Any) -> Any:
+    """Return a new instance of the source registered as `name`."""
+    if name not in SOURCES:
+        raise ValueError(f"Unknown metric source {name!r}, use one of {available_sources()}")
+    return SOURCES[name](**kwargs)
+
+
+def available_sources() -> List[str]:
+    """Return the names of all registered sources."""
+    return sorted(SOURCES)
+
+
+@register_source("process")
+class ProcessIOSource(MetricSource):
+
+    """Tracks the I/O of this very process from `/proc/self/io`, page cache hits included in `mb_rchar`."""
+
+    COUNTERS: ClassVar[Tuple[str, ...]] = ("rchar", "wchar", "syscr", "syscw", "read_bytes", "write_bytes")
+
+    RATES = {
+        "mb_read": ("read_bytes", 1e-6),
+        "mb_writ": ("write_bytes", 1e-6),
+        "mb_rchar": ("rchar", 1e-6),
+        "mb_wchar": ("wchar", 1e-6),
+        "read_calls": ("syscr", 1.0),
+        "writ_calls": ("syscw", 1.0),
+    }
+
+    def __init__(self, io_path: str = "/proc/self/io") -> None:
+        self._io = ProcFile(io_path)
+        super().__init__()
+
+    def read(self) -> Dict[str, float]:
+        """Return bytes and calls counters since the process started."""
+        return {key: float(value) for key, value in parse_key_values(self._io.read(), self.COUNTERS).items()}
+
+    def close(self) -> None:
+        """Release the `/proc/self/io` file handle."""
+        self._io.close()
+
+
+# The built-in meters with per device, export or tag state predate `MetricSource` but follow the same contract.
+register_source("net")(NetworkMetrics)
+register_source("disk")(DiskMetrics)
+register_source("nfs")(MountStatsMetrics)
+register_source("memory")(MemoryIOMetrics)
+register_source("pressure")(PressureMetrics)
+register_source("trace")(TracingMetrics)
+
+
+class SourceScheduler(MetricsSampler):
+
+    """Drives several sources from a single background thread, reading all counters first then deriving metrics."""
+
+    def __init__(self, sources: Dict[str, Any], interval_secs: float = 1.0) -> None:
+        super().__init__(list(sources.values()), interval_secs=interval_secs)
+        self.sources: Dict[str, Any] = dict(sources)
+
+        self._plugins: List[MetricSource] = [meter for meter in self.meters if isinstance(meter, MetricSource)]
+        self._meters: List[Any] = [meter for meter in self.meters if not isinstance(meter, MetricSource)]
+
+    @classmethod
+    def from_names(cls, names: Sequence[str], interval_secs: float = 1.0) -> "SourceScheduler":
+        """Return a scheduler of new instances of the sources registered with the given names."""
+        return cls({name: get_source(name) for name in names}, interval_secs=interval_secs)
+
+    def update_meters(self) -> None:
+        """Read every source back to back, then derive their metrics with one shared timestamp."""
+        all_new_stats: List[Dict[str, float]] = [plugin.read() for plugin in self._plugins]
+        now: float = time.time()
+
+        for plugin, new_stats in zip(self._plugins, all_new_stats):
+            plugin.update_from(new_stats, now)
+
+        for meter in self._meters:
+            meter.update_stats()
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "MetricSource",
+    "ProcessIOSource",
+    "SourceScheduler",
+    "register_source",
+    "get_source",
+    "available_sources",
+]
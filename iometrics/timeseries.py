@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+## Columnar in-memory history of the metrics.
+
+`TimeSeriesStore` keeps the last value of every `AverageMetrics` of the given meters, one row per sample,
+in preallocated typed `array.array` columns sized once from a memory budget. When the budget is full the
+oldest half of the rows is merged pairwise into `mean`, `min` and `max` buckets, so recent samples keep
+full resolution while older ones get coarser, and a multi-day run fits in a few MB.
+
+```py
+from iometrics import DiskMetrics, NetworkMetrics
+from iometrics.sampler import MetricsSampler
+from iometrics.timeseries import TimeSeriesStore
+
+net, disk = NetworkMetrics(), DiskMetrics()
+store = TimeSeriesStore({"net": net, "disk": disk}, budget_bytes=4 * 1024 * 1024)
+
+sampler = MetricsSampler([net, disk])
+sampler.add_listener(store.record)
+sampler.start()
+...
+frame = store.to_pandas()  # or store.to_numpy(), store.to_arrow()
+```
+
+NumPy, pandas and pyarrow are optional, only imported by the exporting methods: install them with
+`pip install iometrics[numpy]`, `iometrics[pandas]` or `iometrics[arrow]`.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import time
+from array import array
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.average_metrics import get_average_metrics
+
+
+DEFAULT_BUDGET_BYTES = 4 * 1024 * 1024
+
+# Each metric is stored as 3 columns.
+AGGREGATES: Tuple[str, ...] = ("mean", "min", "max")
+
+
+def _zeros(typecode: str, length: int) -> "array[Any]":
+    return array(typecode, bytes(array(typecode).itemsize * length))
+
+
+class TimeSeriesStore:
+
+    """Records every `AverageMetrics` of the `sources` meters into fixed size columns, downsampling the oldest rows."""
+
+    # pylint: disable=too-many-instance-attributes
+    # Columns are kept as separate typed arrays so each one can be exported to NumPy or Arrow without copying.
+
+    def __init__(self, sources: Dict[str, Any], budget_bytes: int = DEFAULT_BUDGET_BYTES) -> None:
+        # Compiled once, e.g. ("disk.mb_read", disk.mb_read)
+        self._metrics: List[Tuple[str, AverageMetrics]] = [
+            (f"{source_name}.{attribute}", value)
+            for source_name, meter in sources.items()
+            for attribute, value in get_average_metrics(meter).items()
+        ]
+        self.metric_names: List[str] = [name for name, _ in self._metrics]
+
+        # Per row: the timestamp, the number of samples merged into it and `AGGREGATES` of every metric.
+        row_bytes: int = 8 + 8 + 8 * len(AGGREGATES) * len(self._metrics)
+        self.capacity: int = budget_bytes // row_bytes
+        if self.capacity < 4:
+            raise ValueError(f"budget_bytes={budget_bytes} is too small, each row needs {row_bytes} bytes")
+
+        self.timestamps = _zeros("d", self.capacity)
+        self.counts = _zeros("q", self.capacity)
+        self.columns: Dict[str, "array[Any]"] = {
+            f"{name}.{aggregate}": _zeros("d", self.capacity) for name in self.metric_names for aggregate in AGGREGATES
+        }
+        self._means: List["array[Any]"] = [self.columns[f"{name}.mean"] for name in self.metric_names]
+        self._mins: List["array[Any]"] = [self.columns[f"{name}.min"] for name in self.metric_names]
+        self._maxs: List["array[Any]"] = [self.columns[f"{name}.max"] for name in self.metric_names]
+
+        self.length: int = 0
+        self.compactions: int = 0
+
+    def __len__(self) -> int:
+        return self.length
+
+    def record(self, now: Optional[float] = None) -> None:
+        """Append the last value of every metric, meant to be registered as a sampler listener."""
+        self.append(time.time() if now is None else now, [metric.val for _, metric in self._metrics])
+
+    def append(self, timestamp: float, values: Sequence[float]) -> None:
+        """Append one row with a value for each of `metric_names`, in that order."""
+        if self.length == self.capacity:
+            self.compact()
+
+        row: int = self.length
+        self.timestamps[row] = timestamp
+        self.counts[row] = 1
+        for index, value in enumerate(values):
+            self._means[index][row] = value
+            self._mins[index][row] = value
+            self._maxs[index][row] = value
+        self.length += 1
+
+    def compact(self) -> None:
+        """Merge the oldest half of the rows pairwise, freeing a quarter of the capacity."""
+        half: int = (self.length // 2) & ~1
+        merged: int = half // 2
+
+        for target in range(merged):
+            older, newer = 2 * target, 2 * target + 1
+            older_count, newer_count = self.counts[older], self.counts[newer]
+            total_count = older_count + newer_count
+
+            # A bucket is stamped with the time of its first sample.
+            self.timestamps[target] = self.timestamps[older]
+            self.counts[target] = total_count
+            for means, mins, maxs in zip(self._means, self._mins, self._maxs):
+                means[target] = (means[older] * older_count + means[newer] * newer_count) / total_count
+                mins[target] = min(mins[older], mins[newer])
+                maxs[target] = max(maxs[older], maxs[newer])
+
+        # Slide the untouched recent rows down right after the merged ones.
+        old_length: int = self.length
+        new_length: int = old_length - merged
+        for column in [self.timestamps, self.counts, *self.columns.values()]:
+            column[merged:new_length] = column[half:old_length]
+
+        self.length = new_length
+        self.compactions += 1
+
+    def memory_bytes(self) -> int:
+        """Return the bytes taken by the preallocated columns."""
+        return sum(column.itemsize * len(column) for column in [self.timestamps, self.counts, *self.columns.values()])
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Return `timestamp`, `count` and `<source>.<metric>.<aggregate>` NumPy arrays sharing memory with the store.
+
+        The arrays are read-only views, they change if more rows are recorded; `.copy()` them to keep them around.
+        """
+        import numpy as np  # pylint: disable=import-outside-toplevel,import-error
+
+        def view(column: "array[Any]") -> Any:
+            values = np.frombuffer(column, dtype=np.dtype(column.typecode), count=self.length)
+            values.flags.writeable = False
+            return values
+
+        arrays: Dict[str, Any] = {"timestamp": view(self.timestamps), "count": view(self.counts)}
+        for name, column in self.columns.items():
+            arrays[name] = view(column)
+        return arrays
+
+    def to_pandas(self) -> Any:
+        """Return a pandas `DataFrame` indexed by the sample time.
+
+        pandas consolidates the columns into 2D blocks, so unlike `to_numpy()` the frame is a copy of the store.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel,import-error
+
+        arrays = self.to_numpy()
+        index = pd.to_datetime(arrays.pop("timestamp"), unit="s")
+        return pd.DataFrame(arrays, index=index)
+
+    def to_arrow(self) -> Any:
+        """Return a pyarrow `Table`, the float columns wrap the store memory without copying."""
+        import pyarrow as pa  # pylint: disable=import-outside-toplevel,import-error
+
+        return pa.table(self.to_numpy())
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "TimeSeriesStore",
+    "DEFAULT_BUDGET_BYTES",
+]
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+"""
+## Application-level I/O tracing.
+
+Kernel counters tell how busy the disks are, not which of our own readers (shards, index files, checkpoints)
+keep them busy. These opt-in wrappers count bytes, calls and latency per tag:
+
+```py
+from iometrics.tracing import TracingMetrics, trace_io, traced_open
+
+with traced_open("/data/shard-0001.tar", "rb", tag="shards") as file:
+    header = file.read(512)
+
+class ImageNet(Dataset):
+    @trace_io("imagenet")
+    def __getitem__(self, index):
+        ...
+
+with trace_io("checkpoints") as span:
+    span.bytes_writ += save(model)
+
+trace = TracingMetrics()
+trace.update_stats()
+trace.per_tag_stats_ps["shards"].mb_read_ps
+```
+
+The hot path never takes a lock: every thread adds to its own counters, registered once per thread,
+and `TracingMetrics.update_stats()` merges them when sampling, folding the counters of exited threads
+into a single table so long-lived thread pools don't grow the registry. Only the current process is traced,
+DataLoader worker processes keep their own counters.
+
+Text mode files count characters rather than bytes.
+
+:copyright: (c) 2021 by Leo Gallucci.
+:license: Apache 2.0, see LICENSE for more details.
+"""
+import functools
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import IO
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
+
+from iometrics.average_metrics import AverageMetrics
+
+
+# Index of each counter in the per-thread, per-tag counter lists.
+BYTES_READ, BYTES_WRIT, CALLS, LATENCY_NS = range(4)
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+# Counters tables, tag to counters, of the live threads that traced something.
+_thread_tables: List[Tuple[threading.Thread, Dict[str, List[int]]]] = []
+# Counters of the threads that exited since, merged.
+_retired_table: Dict[str, List[int]] = {}
+
+
+def _get_counters(tag: str) -> List[int]:
+    try:
+        table: Dict[str, List[int]] = _local.table
+    except AttributeError:
+        table = _local.table = {}
+        # Once per thread.
+        with _registry_lock:
+            _thread_tables.append((threading.current_thread(), table))
+
+    counters = table.get(tag)
+    if counters is None:
+        counters = table[tag] = [0, 0, 0, 0]
+    return counters
+
+
+def record_io(tag: str, bytes_read: int = 0, bytes_writ: int = 0, latency_ns: int = 0) -> None:
+    """Count one call of `tag` in the counters of the current thread."""
+    counters = _get_counters(tag)
+    counters[BYTES_READ] += bytes_read
+    counters[BYTES_WRIT] += bytes_writ
+    counters[CALLS] += 1
+    counters[LATENCY_NS] += latency_ns
+
+
+@dataclass
+class TraceStats:
+
+    """Simple data class to store traced totals of one tag since the process started."""
+
+    bytes_read: int = 0
+    bytes_writ: int = 0
+    calls: int = 0
+    latency_ns: int = 0
+
+
+@dataclass
+class AggregateTraceStats:
+
+    """Simple data class to store traced statistics of one tag per second."""
+
+    mb_read_ps: float = 0.0
+    mb_writ_ps: float = 0.0
+    calls_ps: float = 0.0
+    # Average per call.
+    latency_ms: float = 0.0
+
+
+def _retire_exited_threads() -> None:
+    """Fold the counters of exited threads into `_retired_table`, the caller must hold `_registry_lock`."""
+    live_tables = []
+    for thread, table in _thread_tables:
+        if thread.is_alive():
+            live_tables.append((thread, table))
+            continue
+        for tag, counters in table.items():
+            retired = _retired_table.setdefault(tag, [0, 0, 0, 0])
+            for index, value in enumerate(counters):
+                retired[index] += value
+    _thread_tables[:] = live_tables
+
+
+def get_trace_stats() -> Dict[str, TraceStats]:
+    """Return the totals of every tag merged across all threads, exited ones included."""
+    with _registry_lock:
+        _retire_exited_threads()
+        tables = [table for _, table in _thread_tables]
+        tables.append({tag: list(counters) for tag, counters in _retired_table.items()})
+
+    stats: Dict[str, TraceStats] = {}
+    for table in tables:
+        # `dict.copy()` is atomic so the owning thread can keep adding tags meanwhile.
+        for tag, counters in table.copy().items():
+            tag_stats = stats.setdefault(tag, TraceStats())
+            tag_stats.bytes_read += counters[BYTES_READ]
+            tag_stats.bytes_writ += counters[BYTES_WRIT]
+            tag_stats.calls += counters[CALLS]
+            tag_stats.latency_ns += counters[LATENCY_NS]
+    return stats
+
+
+class TraceSpan:
+
+    """Context manager or decorator that counts one call of `tag` and its latency, plus any bytes it is told."""
+
+    def __init__(self, tag: str) -> None:
+        self.tag = tag
+        # Set these inside a `with` block, a decorated function returning bytes counts them as read.
+        self.bytes_read: int = 0
+        self.bytes_writ: int = 0
+        self._start_ns: int = 0
+
+    def __enter__(self) -> "TraceSpan":
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        record_io(self.tag, self.bytes_read, self.bytes_writ, time.perf_counter_ns() - self._start_ns)
+
+    def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        tag = self.tag
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start_ns: int = time.perf_counter_ns()
+            result: Any = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                bytes_read = len(result) if isinstance(result, (bytes, bytearray, memoryview)) else 0
+                record_io(tag, bytes_read=bytes_read, latency_ns=time.perf_counter_ns() - start_ns)
+
+        return wrapper
+
+
+def trace_io(tag: str) -> TraceSpan:
+    """Return a `TraceSpan` of `tag`, use it as `with trace_io("tag"):` or as a `@trace_io("tag")` decorator."""
+    return TraceSpan(tag)
+
+
+class TracedFile:
+
+    """Wraps a file object counting the bytes, calls and latency of its reads and writes under `tag`."""
+
+    def __init__(self, file: IO[Any], tag: str) -> None:
+        self.file = file
+        self.tag = tag
+
+    def _read(self, method: Callable[..., Any], *args: Any) -> Any:
+        start_ns: int = time.perf_counter_ns()
+        data = method(*args)
+        record_io(self.tag, bytes_read=len(data), latency_ns=time.perf_counter_ns() - start_ns)
+        return data
+
+    def read(self, size: int = -1) -> Any:
+        """Read and count up to `size` bytes."""
+        return self._read(self.file.read, size)
+
+    def read1(self, size: int = -1) -> Any:
+        """Read and count up to `size` bytes with at most one call to the underlying raw stream."""
+        return self._read(self.file.read1, size)  # type: ignore
+
+    def readline(self, size: int = -1) -> Any:
+        """Read and count one line."""
+        return self._read(self.file.readline, size)
+
+    def readlines(self, hint: int = -1) -> List[Any]:
+        """Read and count all lines, as one call."""
+        start_ns: int = time.perf_counter_ns()
+        lines: List[Any] = self.file.readlines(hint)
+        record_io(self.tag, bytes_read=sum(map(len, lines)), latency_ns=time.perf_counter_ns() - start_ns)
+        return lines
+
+    def readinto(self, buffer: Any) -> int:
+        """Read into `buffer` and count the bytes read."""
+        start_ns: int = time.perf_counter_ns()
+        num_bytes: int = self.file.readinto(buffer) or 0  # type: ignore
+        record_io(self.tag, bytes_read=num_bytes, latency_ns=time.perf_counter_ns() - start_ns)
+        return num_bytes
+
+    def write(self, data: Any) -> int:
+        """Write and count `data`."""
+        start_ns: int = time.perf_counter_ns()
+        num_written: int = self.file.write(data)
+        record_io(self.tag, bytes_writ=num_written, latency_ns=time.perf_counter_ns() - start_ns)
+        return num_written
+
+    def writelines(self, lines: Iterable[Any]) -> None:
+        """Write and count all `lines`, as one call."""
+        lines = list(lines)
+        start_ns: int = time.perf_counter_ns()
+        self.file.writelines(lines)
+        record_io(self.tag, bytes_writ=sum(map(len, lines)), latency_ns=time.perf_counter_ns() - start_ns)
+
+    def __iter__(self) -> Iterator[Any]:
+        return self
+
+    def __next__(self) -> Any:
+        line = self.readline()
+        if not line:
+            raise StopIteration
+        return line
+
+    def __enter__(self) -> "TracedFile":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.file.close()
+
+    def __getattr__(self, name: str) -> Any:
+        # Everything not traced, e.g. `seek`, `tell`, `close` or `name`, goes to the wrapped file.
+        return getattr(self.file, name)
+
+
+def traced_open(
+    file: Any, mode: str = "r", *, tag: str = "files", encoding: Optional[str] = None, **kwargs: Any
+) -> TracedFile:
+    """Same as the built-in `open()` but returns a `TracedFile` counting its I/O under `tag`.
+
+    Arguments after `mode`, e.g. `encoding`, `buffering` or `newline`, have to be passed as keywords.
+    """
+    # pylint: disable=consider-using-with
+    return TracedFile(open(file, mode, encoding=encoding, **kwargs), tag)
+
+
+class TracingMetrics:
+
+    """Tracks and computes traced read/written MBytes/s, calls/s and average call latency, in total and per tag."""
+
+    def __init__(self, tags: Optional[Sequence[str]] = None) -> None:
+        self.mb_read = AverageMetrics()
+        self.mb_writ = AverageMetrics()
+        self.calls = AverageMetrics()
+        self.latency_ms = AverageMetrics()
+
+        # `None` means all tags, including the ones first used after this meter was created.
+        self.tags: Optional[Sequence[str]] = tags
+
+        self.last_stats: Dict[str, TraceStats] = self.get_trace_stats()
+        self.last_log_time: float = time.time()
+
+        # Per-tag rates computed during the last `update_stats` call.
+        self.per_tag_stats_ps: Dict[str, AggregateTraceStats] = {}
+
+    def get_trace_stats(self) -> Dict[str, TraceStats]:
+        """Return the merged totals of the tracked tags."""
+        stats = get_trace_stats()
+        if self.tags is None:
+            return stats
+        return {tag: stats.get(tag, TraceStats()) for tag in self.tags}
+
+    def update_stats(self) -> None:
+        """Compute metrics since last measurement then returns stats per second."""
+        time_delta: float = time.time() - self.last_log_time
+
+        # Two samples within the clock resolution would divide by zero.
+        if time_delta <= 0:
+            return
+
+        new_stats: Dict[str, TraceStats] = self.get_trace_stats()
+
+        total = TraceStats()
+        per_tag_stats_ps: Dict[str, AggregateTraceStats] = {}
+
+        for tag, tag_stats in new_stats.items():
+            last_stats = self.last_stats.get(tag, TraceStats())
+
+            # There's a bug that sometimes the delta is negative messing up the average.
+            delta = TraceStats(
+                bytes_read=max(0, tag_stats.bytes_read - last_stats.bytes_read),
+                bytes_writ=max(0, tag_stats.bytes_writ - last_stats.bytes_writ),
+                calls=max(0, tag_stats.calls - last_stats.calls),
+                latency_ns=max(0, tag_stats.latency_ns - last_stats.latency_ns),
+            )
+            per_tag_stats_ps[tag] = compute_trace_stats_ps(delta, time_delta)
+
+            total.bytes_read += delta.bytes_read
+            total.bytes_writ += delta.bytes_writ
+            total.calls += delta.calls
+            total.latency_ns += delta.latency_ns
+
+        aggr = compute_trace_stats_ps(total, time_delta)
+
+        self.mb_read.update(aggr.mb_read_ps, time_delta)
+        self.mb_writ.update(aggr.mb_writ_ps, time_delta)
+        self.calls.update(aggr.calls_ps, time_delta)
+        self.latency_ms.update(aggr.latency_ms, time_delta)
+
+        self.last_log_time = time.time()
+        self.last_stats = new_stats
+        self.per_tag_stats_ps = per_tag_stats_ps
+
+
+def compute_trace_stats_ps(delta: TraceStats, time_delta: float) -> AggregateTraceStats:
+    """Compute the stats per second out of the counter deltas of one sampling interval."""
+    return AggregateTraceStats(
+        mb_read_ps=delta.bytes_read / 1e6 / time_delta,
+        mb_writ_ps=delta.bytes_writ / 1e6 / time_delta,
+        calls_ps=delta.calls / time_delta,
+        latency_ms=delta.latency_ns / 1e6 / delta.calls if delta.calls else 0.0,
+    )
+
+
+# `__all__` is left here for documentation purposes and as a
+# reference to which interfaces are meant to be imported.
+__all__ = [
+    "TracingMetrics",
+    "TracedFile",
+    "TraceSpan",
+    "TraceStats",
+    "AggregateTraceStats",
+    "trace_io",
+    "traced_open",
+    "record_io",
+    "get_trace_stats",
+]
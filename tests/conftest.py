@@ -0,0 +1,10 @@
+#!/usr/bin/env python3
+import pytest
+
+from tests.helpers import FakeMeter
+
+
+@pytest.fixture(name="fake_meter")
+def fixture_fake_meter() -> FakeMeter:
+    """A new `FakeMeter`, e.g. to stand for the `"disk"` source of alert rules or of a `TimeSeriesStore`."""
+    return FakeMeter()
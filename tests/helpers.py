@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+from iometrics.average_metrics import AverageMetrics
+
+
+class FakeMeter:
+
+    """Meter whose metrics are set by the test, counting its `update_stats()` calls."""
+
+    def __init__(self) -> None:
+        self.mb_read = AverageMetrics()
+        self.io_util = AverageMetrics()
+        self.updates = 0
+        self.last_log_time = 0.0
+
+    def update_stats(self) -> None:
+        self.updates += 1
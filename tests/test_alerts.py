@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+from typing import List
+
+import pytest
+
+from iometrics.alerts import AlertEngine
+from iometrics.alerts import AlertEvent
+from iometrics.alerts import AlertRule
+from tests.helpers import FakeMeter
+
+
+def test_alert_fires_after_for_secs_and_resolves_with_hysteresis(fake_meter: FakeMeter) -> None:
+    disk = fake_meter
+    rule = AlertRule("disk_saturated", "disk.io_util", ">", 95, for_secs=2, clear_threshold=80)
+    engine = AlertEngine([rule], sources={"disk": disk})
+    received: List[AlertEvent] = []
+    engine.add_listener(received.append)
+
+    disk.io_util.update(99)
+    assert engine.evaluate(now=0.0) == []
+    assert engine.evaluate(now=1.0) == []
+    [fired] = engine.evaluate(now=2.0)
+    assert fired.firing and fired.rule == "disk_saturated"
+
+    # Below the threshold but above the clear threshold: still firing
+    disk.io_util.update(90)
+    assert engine.evaluate(now=3.0) == []
+    assert engine.firing() == {"disk_saturated": True}
+
+    disk.io_util.update(50)
+    [resolved] = engine.evaluate(now=4.0)
+    assert not resolved.firing
+    assert received == [fired, resolved]
+
+
+def test_alert_rolling_window_and_cooldown(fake_meter: FakeMeter) -> None:
+    disk = fake_meter
+    rule = AlertRule("busy", "disk.io_util", ">=", 50, rolling_secs=10, cooldown_secs=100)
+    engine = AlertEngine([rule], sources={"disk": disk})
+
+    disk.io_util.update(0)
+    engine.evaluate(now=0.0)
+    disk.io_util.update(90)
+    # Mean of 0 and 90 is 45
+    assert engine.evaluate(now=1.0) == []
+    assert engine.evaluate(now=2.0)[0].firing
+
+    disk.io_util.update(0)
+    for now in range(3, 20):
+        engine.evaluate(now=float(now))
+    disk.io_util.update(90)
+    # Condition holds again but the cooldown didn't expire yet
+    assert engine.evaluate(now=25.0) == []
+
+
+def test_alert_rolling_window_forgets_old_samples(fake_meter: FakeMeter) -> None:
+    disk = fake_meter
+    engine = AlertEngine([AlertRule("busy", "disk.io_util", ">", 50, rolling_secs=2)], sources={"disk": disk})
+
+    disk.io_util.update(100)
+    assert engine.evaluate(now=0.0)[0].firing
+    disk.io_util.update(40)
+    engine.evaluate(now=1.0)
+    engine.evaluate(now=2.0)
+    # The 100 sample is out of the window: mean of 40, 40 and 40
+    disk.io_util.update(40)
+    assert not engine.evaluate(now=3.0)[0].firing
+
+
+def test_alert_rule_on_unknown_metric(fake_meter: FakeMeter) -> None:
+    with pytest.raises(ValueError):
+        AlertEngine([AlertRule("typo", "disk.io_utli", ">", 95)], sources={"disk": fake_meter})
+
+
+def test_alert_resolves_when_its_guard_turns_false(fake_meter: FakeMeter) -> None:
+    disk = fake_meter
+    training = [True]
+    engine = AlertEngine([AlertRule("busy", "disk.io_util", ">", 95, when=lambda: training[0])], sources={"disk": disk})
+
+    disk.io_util.update(99)
+    assert engine.evaluate(now=0.0)[0].firing
+
+    # Validation starts while the disk is still saturated.
+    training[0] = False
+    [resolved] = engine.evaluate(now=1.0)
+    assert not resolved.firing
+    assert engine.firing() == {"busy": False}
+    assert engine.evaluate(now=2.0) == []
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import csv
+import io
+import json
+import time
+from typing import List
+
+import pytest
+
+from iometrics.cli import iometrics_cli_entrypoint
+from iometrics.disk import get_diskstats_devices
+from iometrics.output import SAMPLE_FIELDS
+from iometrics.sampler import iter_ticks
+
+
+def test_start_jsonl(capsys: pytest.CaptureFixture[str]) -> None:
+    iometrics_cli_entrypoint(["start", "--interval", "0.05", "--count", "2", "--format", "jsonl"])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 2
+    assert set(json.loads(lines[0])) == set(SAMPLE_FIELDS)
+
+
+def test_start_csv_with_filters(capsys: pytest.CaptureFixture[str]) -> None:
+    device = get_diskstats_devices()[0]
+    iometrics_cli_entrypoint(
+        ["start", "--interval", "0.05", "--count", "3", "--format", "csv", "--devices", device, "--interfaces", "lo"]
+    )
+
+    rows = list(csv.reader(io.StringIO(capsys.readouterr().out)))
+    assert rows[0] == list(SAMPLE_FIELDS)
+    assert len(rows) == 4
+
+
+@pytest.mark.parametrize(
+    "argv",
+    [
+        ["start", "--colour"],
+        ["start", "--devices", "nodisk"],
+        ["start", "--interfaces", "noiface"],
+        ["start", "--interval", "0"],
+        ["start", "--interval", "-1"],
+        ["serve", "--sources", "nosource"],
+        ["serve", "--interval", "2", "--max-interval", "0.5"],
+    ],
+)
+def test_start_rejects_unknown_arguments(argv: List[str], capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit) as exit_info:
+        iometrics_cli_entrypoint(argv)
+
+    assert exit_info.value.code == 2
+    assert argv[-1] in capsys.readouterr().err
+
+
+def test_iter_ticks_does_not_drift() -> None:
+    start = time.monotonic()
+    for _ in iter_ticks(0.02, count=10):
+        time.sleep(0.005)
+
+    assert time.monotonic() - start == pytest.approx(0.2, abs=0.05)
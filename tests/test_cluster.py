@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+import socket
+import struct
+import time
+
+import pytest
+
+from iometrics.cluster import ClusterAgent
+from iometrics.cluster import ClusterCollector
+from iometrics.cluster import decode_batch
+from iometrics.cluster import encode_batch
+from iometrics.cluster import HostSnapshot
+from iometrics.cluster import MAX_FRAME_BYTES
+
+
+def _wait_for_hosts(collector: ClusterCollector, expected: int) -> None:
+    deadline = time.time() + 5
+    while len(collector.hosts()) < expected and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_encode_decode_batch_roundtrip() -> None:
+    snapshots = [
+        HostSnapshot(timestamp=1000.0, mb_read_ps=12.34, io_util=99.5),
+        HostSnapshot(timestamp=1001.0, mb_read_ps=0.0, io_util=3.0, mb_recv_ps=250.01),
+    ]
+
+    payload = encode_batch("node-1", snapshots)
+    host_name, decoded = decode_batch(payload)
+
+    assert host_name == "node-1"
+    assert decoded == snapshots
+    # 8 metrics per sample delta encoded: way smaller than 8 doubles per sample
+    assert len(payload) < 2 * 8 * 8
+
+
+@pytest.mark.parametrize("protocol", ["udp", "tcp"])
+def test_many_agents_on_localhost(protocol: str) -> None:
+    collector = ClusterCollector(host="127.0.0.1", port=0, protocol=protocol)
+    collector.start()
+    try:
+        num_agents = 20
+        for index in range(num_agents):
+            agent = ClusterAgent(
+                collector.address,
+                host_name=f"host-{index}",
+                batch_size=2,
+                protocol=protocol,
+                track_network_utilization=False,
+                track_disk_utilization=False,
+            )
+            agent.record(HostSnapshot(timestamp=time.time(), io_util=50.0, mb_read_ps=1.0))
+            agent.record(HostSnapshot(timestamp=time.time(), io_util=float(index), mb_read_ps=2.0))
+            agent.close()
+
+        _wait_for_hosts(collector, num_agents)
+
+        aggregate = collector.aggregate()
+        assert aggregate.num_hosts == num_agents
+        assert aggregate.totals["mb_read_ps"] == pytest.approx(2.0 * num_agents)
+        assert collector.top_hosts("io_util", n=3) == [("host-19", 19.0), ("host-18", 18.0), ("host-17", 17.0)]
+        assert len(collector.host_history("host-0")) == 2
+    finally:
+        collector.stop()
+
+
+def test_malformed_messages_are_dropped() -> None:
+    collector = ClusterCollector(host="127.0.0.1", port=0)
+    try:
+        payload = encode_batch("node-1", [HostSnapshot(timestamp=1000.0, mb_read_ps=1.0)] * 3)
+
+        assert not collector.receive(payload[:-3])
+        assert not collector.receive(b"XX\x01\x01")
+        assert collector.receive(payload)
+        assert collector.dropped_messages == 2
+        assert collector.hosts() == ["node-1"]
+    finally:
+        collector.stop()
+
+
+def test_agent_batch_size_fits_the_wire_format() -> None:
+    with pytest.raises(ValueError):
+        ClusterAgent(("127.0.0.1", 9), batch_size=256)
+
+
+def test_out_of_order_samples_dont_replace_newer_ones() -> None:
+    collector = ClusterCollector(host="127.0.0.1", port=0)
+    try:
+        collector.ingest(encode_batch("node-1", [HostSnapshot(timestamp=1002.0, io_util=20.0)]))
+        collector.ingest(encode_batch("node-1", [HostSnapshot(timestamp=1001.0, io_util=10.0)]))
+
+        assert collector.top_hosts("io_util") == [("node-1", 20.0)]
+        assert collector.aggregate().totals["io_util"] == pytest.approx(20.0)
+        assert len(collector.host_history("node-1")) == 1
+    finally:
+        collector.stop()
+
+
+def test_oversized_tcp_frames_are_dropped() -> None:
+    collector = ClusterCollector(host="127.0.0.1", port=0, protocol="tcp")
+    collector.start()
+    try:
+        with socket.create_connection(collector.address) as sock:
+            sock.sendall(struct.pack("!I", MAX_FRAME_BYTES + 1))
+            # The collector hangs up instead of waiting for a huge body.
+            assert sock.recv(1) == b""
+        assert collector.dropped_messages == 1
+    finally:
+        collector.stop()
+
+
+def test_agent_reconnects_after_the_collector_goes_away() -> None:
+    collector = ClusterCollector(host="127.0.0.1", port=0, protocol="tcp")
+    address = collector.address
+    collector.stop()
+
+    agent = ClusterAgent(
+        address,
+        host_name="node-1",
+        batch_size=1,
+        protocol="tcp",
+        track_network_utilization=False,
+        track_disk_utilization=False,
+    )
+    agent.record(HostSnapshot(timestamp=1000.0))
+    assert agent.dropped_batches == 1
+
+    collector = ClusterCollector(host="127.0.0.1", port=address[1], protocol="tcp")
+    collector.start()
+    try:
+        agent.record(HostSnapshot(timestamp=1001.0, io_util=5.0))
+        agent.close()
+        _wait_for_hosts(collector, 1)
+        assert collector.top_hosts("io_util") == [("node-1", 5.0)]
+        assert agent.dropped_batches == 1
+    finally:
+        collector.stop()
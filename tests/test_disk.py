@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import dataclasses
+import functools
+import os
+from pathlib import Path
+
+import pytest
+
+from iometrics.disk import _get_mount_source_name
+from iometrics.disk import BlockTopology
+from iometrics.disk import DiskMetrics
+from iometrics.disk import get_block_topology
+from iometrics.disk import get_path_disk_devices
+
+
+def _make_device(root: Path, kind: str, name: str) -> Path:
+    device_dir = root / "devices" / kind / name
+    (device_dir / "slaves").mkdir(parents=True)
+    (device_dir / "holders").mkdir()
+    os.symlink(os.path.relpath(device_dir, root / "block"), root / "block" / name)
+    return device_dir
+
+
+@pytest.fixture(name="stacked_topology")
+def fixture_stacked_topology(tmp_path: Path) -> BlockTopology:
+    """LVM on top of dm-crypt on top of an NVMe partition next to a plain one, a SATA disk and a loop device."""
+    (tmp_path / "block").mkdir()
+
+    nvme = _make_device(tmp_path, "pci0000:00", "nvme0n1")
+    (nvme / "nvme0n1p1" / "holders").mkdir(parents=True)
+    (nvme / "nvme0n1p1" / "partition").write_text("1")
+    (nvme / "nvme0n1p1" / "holders" / "dm-0").touch()
+    (nvme / "nvme0n1p2" / "holders").mkdir(parents=True)
+    (nvme / "nvme0n1p2" / "partition").write_text("2")
+
+    crypt = _make_device(tmp_path, "virtual/block", "dm-0")
+    (crypt / "slaves" / "nvme0n1p1").touch()
+    (crypt / "holders" / "dm-1").touch()
+    (crypt / "holders" / "dm-2").touch()
+
+    for logical_volume in ("dm-1", "dm-2"):
+        (_make_device(tmp_path, "virtual/block", logical_volume) / "slaves" / "dm-0").touch()
+
+    _make_device(tmp_path, "pci0000:00", "sda")
+    _make_device(tmp_path, "virtual/block", "loop0")
+
+    return get_block_topology(str(tmp_path / "block"))
+
+
+def test_block_topology_layers(stacked_topology: BlockTopology) -> None:
+    assert stacked_topology.layer_devices("physical") == ["nvme0n1", "sda"]
+    # The plain partition is not part of the LVM stack, its I/O is only counted through itself.
+    assert stacked_topology.layer_devices("logical") == ["dm-1", "dm-2", "nvme0n1p2", "sda"]
+    assert stacked_topology.physical_devices("dm-2") == {"nvme0n1"}
+    assert stacked_topology.physical_devices("loop0") == set()
+
+    with pytest.raises(ValueError):
+        stacked_topology.layer_devices("everything")
+
+
+def test_disk_metrics_only_tracks_one_layer() -> None:
+    topology = get_block_topology()
+    disk = DiskMetrics(layer="physical")
+    disk.update_stats()
+
+    assert set(disk.last_stats) <= set(topology.leaves())
+    assert set(disk.per_device_stats_ps) == set(disk.last_stats)
+
+
+def test_path_disk_devices_follow_the_stack(tmp_path: Path, stacked_topology: BlockTopology) -> None:
+    """A path living on the `dm-1` logical volume is served by the `nvme0n1` physical disk."""
+    st_dev = os.stat(tmp_path).st_dev
+    major_minor = f"{os.major(st_dev)}:{os.minor(st_dev)}"
+    (tmp_path / "dev" / "block").mkdir(parents=True)
+    os.symlink(tmp_path / "devices" / "virtual/block" / "dm-1", tmp_path / "dev" / "block" / major_minor)
+
+    # Only read when `tmp_path` lives on an anonymous device, e.g. btrfs.
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text(f"36 35 {major_minor} / /data rw - ext4 /dev/dm-1 rw\n")
+
+    resolve = functools.partial(
+        get_path_disk_devices,
+        disks_devices_dir=str(tmp_path / "block"),
+        sysfs_dev_dir=str(tmp_path / "dev" / "block"),
+        mountinfo_path=str(mountinfo),
+    )
+
+    assert resolve([str(tmp_path)], "physical") == ["nvme0n1"]
+    assert resolve([str(tmp_path)], "logical") == ["dm-1"]
+    assert stacked_topology.holders["nvme0n1"] == ("dm-0",)
+
+
+def test_mount_source_of_anonymous_devices(tmp_path: Path) -> None:
+    mountinfo = tmp_path / "mountinfo"
+    mountinfo.write_text("36 35 0:42 / /data rw - btrfs /dev/dm-1 rw\n37 35 0:43 / /tmp rw - tmpfs tmpfs rw\n")
+
+    assert _get_mount_source_name(os.makedev(0, 42), str(mountinfo)) == "dm-1"
+    assert _get_mount_source_name(os.makedev(0, 43), str(mountinfo)) is None
+    assert _get_mount_source_name(os.makedev(0, 44), str(mountinfo)) is None
+
+
+def test_unresolved_paths_are_reported(tmp_path: Path, stacked_topology: BlockTopology) -> None:
+    """Paths outside any known block device, e.g. tmpfs, must not silently track nothing."""
+    (tmp_path / "dev" / "block").mkdir(parents=True)
+    assert stacked_topology.leaves()
+
+    with pytest.warns(UserWarning), pytest.raises(ValueError):
+        get_path_disk_devices(
+            [str(tmp_path)], disks_devices_dir=str(tmp_path / "block"), sysfs_dev_dir=str(tmp_path / "dev" / "block")
+        )
+
+
+def test_disk_metrics_publishes_immutable_snapshots() -> None:
+    disk = DiskMetrics()
+    before = disk.snapshot
+    disk.update_stats()
+    after = disk.snapshot
+
+    assert after is not before
+    assert after.timestamp == disk.last_log_time
+    assert after.mb_read.val == disk.mb_read.val
+    assert after.io_util.count == before.io_util.count + 1
+    assert after.per_device_stats_ps is disk.per_device_stats_ps
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        after.mb_read.val = 1.0  # type: ignore
+
+
+def test_disk_metrics_keeps_non_virtual_devices_alias() -> None:
+    disk = DiskMetrics(devices=["sdb", "sda"])
+
+    assert disk.non_virtual_devices == ["sda", "sdb"]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+import urllib.error
+import urllib.request
+
+import pytest
+
+from iometrics import DiskMetrics
+from iometrics import NetworkMetrics
+from iometrics.exporter import CONTENT_TYPE_OPENMETRICS
+from iometrics.exporter import MetricsExporter
+from iometrics.exporter import render_openmetrics
+
+
+def test_render_openmetrics() -> None:
+    net = NetworkMetrics()
+    disk = DiskMetrics()
+    disk.update_stats()
+
+    text = render_openmetrics(net, disk).decode("utf-8")
+
+    assert text.endswith("# EOF\n")
+    assert "# TYPE iometrics_disk_read_bytes counter" in text
+    assert "# TYPE iometrics_disk_utilization_percent gauge" in text
+    for device_name in disk.last_stats:
+        assert f'iometrics_disk_read_bytes_total{{device="{device_name}"}}' in text
+        assert f'iometrics_disk_utilization_percent{{device="{device_name}"}}' in text
+    for interface in net.last_stats:
+        assert f'iometrics_network_received_bytes_total{{interface="{interface}"}}' in text
+
+
+def test_exporter_serves_metrics_on_loopback() -> None:
+    exporter = MetricsExporter(port=0, host="127.0.0.1", interval_secs=0.05)
+    exporter.start()
+    try:
+        url = f"http://127.0.0.1:{exporter.address[1]}"
+
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            body: bytes = response.read()
+            assert response.headers["Content-Type"] == CONTENT_TYPE_OPENMETRICS
+
+        assert body.endswith(b"# EOF\n")
+        assert b"iometrics_cpu_io_wait_percent" in body
+
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(f"{url}/other", timeout=5)
+    finally:
+        exporter.stop()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+from pathlib import Path
+
+import pytest
+
+from iometrics import MemoryIOMetrics
+from iometrics.procfs import ProcFile
+
+
+def _write_vmstat(path: Path, pgpgin: int, pgmajfault: int) -> None:
+    path.write_text(f"nr_free_pages 1\npgpgin {pgpgin}\npgpgout 0\npgfault 0\npgmajfault {pgmajfault}\n")
+
+
+def _write_io(path: Path, rchar: int, read_bytes: int) -> None:
+    path.write_text(f"rchar: {rchar}\nwchar: 0\nsyscr: 1\nsyscw: 0\nread_bytes: {read_bytes}\nwrite_bytes: 0\n")
+
+
+def test_proc_file_rereads_same_handle(tmp_path: Path) -> None:
+    path = tmp_path / "vmstat"
+    path.write_text("pgpgin 1\n")
+
+    with ProcFile(str(path)) as proc_file:
+        assert proc_file.read() == "pgpgin 1\n"
+        path.write_text("pgpgin 22\n")
+        assert proc_file.read() == "pgpgin 22\n"
+        assert proc_file.bytes_read == len("pgpgin 1\n") + len("pgpgin 22\n")
+
+    # Shared by all the instances, so any reader can leave all of them out.
+    total_before = ProcFile.total_bytes_read
+    with ProcFile(str(path)) as proc_file:
+        proc_file.read()
+    assert ProcFile.total_bytes_read - total_before == len("pgpgin 22\n")
+
+
+def test_memory_io_metrics(tmp_path: Path) -> None:
+    vmstat = tmp_path / "vmstat"
+    meminfo = tmp_path / "meminfo"
+    proc_io = tmp_path / "io"
+    _write_vmstat(vmstat, pgpgin=0, pgmajfault=0)
+    meminfo.write_text("MemTotal: 100 kB\nCached: 2000 kB\nDirty: 1000 kB\nWriteback: 0 kB\n")
+    _write_io(proc_io, rchar=0, read_bytes=0)
+
+    mem = MemoryIOMetrics(str(vmstat), str(meminfo), str(proc_io))
+    _write_vmstat(vmstat, pgpgin=1000, pgmajfault=10)
+    mem.last_log_time -= 1.0
+    mem.update_stats()
+
+    assert mem.mb_pgin.val == pytest.approx(1.024, rel=0.05)
+    assert mem.major_faults.val == pytest.approx(10.0, rel=0.05)
+    assert mem.mb_dirty.val == pytest.approx(1.024)
+    # Nothing read in between.
+    assert mem.last_read_hit is None
+    assert mem.read_hit.count == 0
+
+    _write_io(proc_io, rchar=4_000_000, read_bytes=3_000_000)
+    mem.update_stats()
+    mem.close()
+
+    assert mem.last_read_hit == pytest.approx(25.0)
+    assert mem.read_hit.val == mem.last_read_hit
+
+
+def test_memory_io_metrics_on_this_host() -> None:
+    mem = MemoryIOMetrics()
+    mem.update_stats()
+    mem.close()
+
+    assert mem.mb_cached.val > 0.0
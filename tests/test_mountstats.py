@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import time
+from pathlib import Path
+
+import pytest
+
+from iometrics.mountstats import get_mounts_stats
+from iometrics.mountstats import MountStatsMetrics
+
+
+EXPORT = "fs-1234.efs.eu-west-1.amazonaws.com:/"
+
+MOUNTSTATS_TEMPLATE = """\
+device rootfs mounted on / with fstype rootfs
+device proc mounted on /proc with fstype proc
+device fs-1234.efs.eu-west-1.amazonaws.com:/ mounted on /mnt/efs with fstype nfs4 statvers=1.1
+\topts:\trw,vers=4.1,rsize=1048576,wsize=1048576,hard,proto=tcp
+\tage:\t86400
+\tbytes:\t0 0 0 0 {read_bytes} {writ_bytes} 0 0
+\tRPC iostats version: 1.1  p/v: 100003/4 (nfs)
+\txprt:\ttcp 0 1 2 0 11 2150 2150 0 2150 0 2 0 0
+\tper-op statistics
+\t        NULL: 0 0 0 0 0 0 0 0 0
+\t        READ: {read_ops} {read_trans} 0 16000 104857600 10 {read_rtt} {read_exe} 0
+\t       WRITE: 10 10 0 1048576 1600 5 40 50 0
+\t     GETATTR: 100 100 0 16000 20000 1 20 25 0
+device fs-1234.efs.eu-west-1.amazonaws.com:/ mounted on /srv/efs-bind with fstype nfs4 statvers=1.1
+\tbytes:\t0 0 0 0 {read_bytes} {writ_bytes} 0 0
+\tper-op statistics
+\t        READ: {read_ops} {read_trans} 0 16000 104857600 10 {read_rtt} {read_exe} 0
+device tmpfs mounted on /tmp with fstype tmpfs
+"""
+
+
+def _write_mountstats(path: Path, **counters: int) -> None:
+    values = dict(read_bytes=0, writ_bytes=0, read_ops=0, read_trans=0, read_rtt=0, read_exe=0)
+    values.update(counters)
+    path.write_text(MOUNTSTATS_TEMPLATE.format(**values))
+
+
+def test_get_mounts_stats_only_parses_nfs(tmp_path: Path) -> None:
+    mountstats = tmp_path / "mountstats"
+    _write_mountstats(mountstats, read_bytes=5000, read_ops=3, read_trans=4, read_rtt=30, read_exe=36)
+
+    stats = get_mounts_stats(str(mountstats))
+
+    # The bind mount of the same export is not counted twice.
+    assert list(stats) == [EXPORT]
+    assert stats[EXPORT].bytes_read == 5000
+    assert stats[EXPORT].ops == 3 + 10 + 100
+    assert stats[EXPORT].retrans == 1
+    assert stats[EXPORT].read_rtt_ms == 30
+
+
+def test_mount_stats_metrics_rates_and_latencies(tmp_path: Path) -> None:
+    mountstats = tmp_path / "mountstats"
+    _write_mountstats(mountstats)
+    nfs = MountStatsMetrics(str(mountstats), instrument=True)
+
+    _write_mountstats(mountstats, read_bytes=2_000_000, read_ops=100, read_trans=102, read_rtt=500, read_exe=700)
+    nfs.last_log_time -= 2.0
+    nfs.update_stats()
+
+    assert nfs.mb_read.val == pytest.approx(1.0, rel=0.05)
+    assert nfs.ops.val == pytest.approx(50.0, rel=0.05)
+    assert nfs.retrans.val == pytest.approx(1.0, rel=0.05)
+    assert nfs.read_rtt_ms.val == pytest.approx(5.0)
+    assert nfs.read_exe_ms.val == pytest.approx(7.0)
+    assert nfs.writ_rtt_ms.val == 0.0
+    assert EXPORT in nfs.per_export_stats_ps
+    assert nfs.snapshot.mb_read.val == nfs.mb_read.val
+    assert nfs.overhead is not None and nfs.overhead.proc_bytes.val > 0
+    nfs.close()
+
+
+def test_mount_stats_metrics_samples_at_the_same_instant(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(time, "time", lambda: 1000.0)
+    mountstats = tmp_path / "mountstats"
+    _write_mountstats(mountstats)
+    nfs = MountStatsMetrics(str(mountstats))
+
+    # Doesn't divide by zero and doesn't count an empty interval.
+    nfs.update_stats()
+    nfs.close()
+    assert nfs.mb_read.count == 0
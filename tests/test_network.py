@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+import time
+from pathlib import Path
+
+import pytest
+
+from iometrics import NetworkMetrics
+from iometrics.network import NET_DEV_REFRESH_SECS
+
+
+def _write_net_dev(path: Path, bytes_recv: int, bytes_sent: int) -> None:
+    path.write_text(
+        "Inter-|   Receive                                                |  Transmit\n"
+        " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls\n"
+        "    lo: 999 9 0 0 0 0 0 0 999 9 0 0 0 0 0 0\n"
+        f"  eth0: {bytes_recv} 1 0 0 0 0 0 0 {bytes_sent} 1 0 0 0 0 0 0\n"
+    )
+
+
+def test_network_metrics_sampled_faster_than_once_a_second(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    net_dev = tmp_path / "dev"
+    _write_net_dev(net_dev, bytes_recv=0, bytes_sent=0)
+    net = NetworkMetrics(net_dev_path=str(net_dev))
+
+    rates = []
+    for step in range(1, 5):
+        now[0] += 0.25
+        _write_net_dev(net_dev, bytes_recv=step * step * 1_000_000, bytes_sent=step * 500_000)
+        net.update_stats()
+        rates.append(net.mb_recv_ps.val)
+
+    # 1, 3, 5 and 7 MB received in each quarter of a second.
+    assert rates == pytest.approx([4.0, 12.0, 20.0, 28.0])
+    assert net.mb_sent_ps.val == pytest.approx(2.0)
+    assert net.snapshot.timestamp == now[0]
+    assert set(net.per_device_stats_ps) == {"eth0"}
+
+    # Two samples at the same instant don't divide by zero.
+    net.update_stats()
+    net.close()
+    assert net.mb_recv_ps.count == 4
+
+
+def test_network_metrics_wait_for_the_counters_to_refresh(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+
+    net_dev = tmp_path / "dev"
+    _write_net_dev(net_dev, bytes_recv=0, bytes_sent=0)
+    net = NetworkMetrics(net_dev_path=str(net_dev))
+
+    # The counters only move every half a second: no zero in between, the rate spans the whole half second.
+    rates = []
+    for step in range(1, 5):
+        now[0] += 0.25
+        _write_net_dev(net_dev, bytes_recv=(step // 2) * 1_000_000, bytes_sent=0)
+        net.update_stats()
+        rates.append(net.mb_recv_ps.val)
+
+    assert rates == pytest.approx([0.0, 2.0, 2.0, 2.0])
+    assert net.mb_recv_ps.count == 2
+
+    # An idle link still reports zero once the counters had time to refresh.
+    now[0] += NET_DEV_REFRESH_SECS
+    net.update_stats()
+    net.close()
+    assert net.mb_recv_ps.val == 0.0
+    assert net.mb_recv_ps.count == 3
+
+
+def test_network_metrics_when_an_interface_vanishes(tmp_path: Path) -> None:
+    net_dev = tmp_path / "dev"
+    net_dev.write_text(
+        "Inter-|   Receive\n face |bytes\n"
+        "  eth0: 0 1 0 0 0 0 0 0 0 1 0 0 0 0 0 0\n"
+        "veth1a: 0 1 0 0 0 0 0 0 0 1 0 0 0 0 0 0\n"
+    )
+    net = NetworkMetrics(net_dev_path=str(net_dev))
+
+    _write_net_dev(net_dev, bytes_recv=1_000_000, bytes_sent=0)
+    net.last_log_time -= 1.0
+    net.update_stats()
+    net.close()
+
+    assert set(net.per_device_stats_ps) == {"eth0"}
+    assert net.mb_recv_ps.val == pytest.approx(1.0, rel=0.05)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+from iometrics import DiskMetrics
+from iometrics.exporter import render_openmetrics
+from iometrics.overhead import OVERHEAD_BUCKETS_SECONDS
+from iometrics.overhead import OverheadMetrics
+
+
+def test_overhead_metrics_histogram() -> None:
+    overhead = OverheadMetrics()
+    for _ in range(3):
+        overhead.start()
+        overhead.stop(proc_bytes=100)
+
+    assert overhead.wall_us.count == 3
+    assert overhead.proc_bytes.tot_sum == 300
+    assert sum(overhead.wall_buckets) == 3
+    assert overhead.cumulative_buckets()[-1] == (OVERHEAD_BUCKETS_SECONDS[-1], 3)
+
+
+def test_instrumented_disk_metrics() -> None:
+    disk = DiskMetrics(instrument=True)
+    disk.update_stats()
+
+    assert disk.overhead is not None
+    assert disk.overhead.wall_us.count == 1
+    assert disk.overhead.wall_us.val > 0
+    assert disk.overhead.proc_bytes.val > 0
+
+    text = render_openmetrics(disk=disk).decode("utf-8")
+    assert "# TYPE iometrics_sample_duration_seconds histogram" in text
+    assert "# UNIT iometrics_sample_duration_seconds seconds" in text
+    assert 'iometrics_sample_duration_seconds_bucket{meter="disk",le="0.025"}' in text
+    assert 'iometrics_sample_duration_seconds_bucket{meter="disk",le="+Inf"} 1' in text
+    assert 'iometrics_sample_duration_seconds_count{meter="disk"} 1' in text
+
+    assert DiskMetrics().overhead is None
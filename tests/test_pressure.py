@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+from pathlib import Path
+
+import pytest
+
+from iometrics import PressureMetrics
+from iometrics.pressure import get_own_cgroup_path
+from iometrics.pressure import parse_pressure_totals
+
+
+def _write_psi(cgroup: Path, resource: str, some_us: int, full_us: int) -> None:
+    (cgroup / f"{resource}.pressure").write_text(
+        f"some avg10=0.00 avg60=0.00 avg300=0.00 total={some_us}\n"
+        f"full avg10=0.00 avg60=0.00 avg300=0.00 total={full_us}\n"
+    )
+
+
+def test_parse_pressure_totals_without_full_line() -> None:
+    # The system wide cpu file of older kernels only has a `some` line.
+    assert parse_pressure_totals("some avg10=1.00 avg60=0.50 avg300=0.10 total=1234\n") == (1234, 0)
+
+
+def test_pressure_metrics_from_cgroup_totals(tmp_path: Path) -> None:
+    _write_psi(tmp_path, "io", some_us=0, full_us=0)
+    _write_psi(tmp_path, "memory", some_us=0, full_us=0)
+
+    psi = PressureMetrics(cgroup_path=str(tmp_path))
+    assert psi.available
+
+    _write_psi(tmp_path, "io", some_us=500_000, full_us=250_000)
+    _write_psi(tmp_path, "memory", some_us=10_000, full_us=0)
+    psi.last_log_time -= 1.0
+    psi.update_stats()
+    psi.close()
+
+    assert psi.io_some.val == pytest.approx(50.0, rel=0.05)
+    assert psi.io_full.val == pytest.approx(25.0, rel=0.05)
+    assert psi.memory_some.val == pytest.approx(1.0, rel=0.05)
+    # No cpu.pressure file in this cgroup
+    assert psi.cpu_some.val == 0.0
+
+
+def test_pressure_metrics_of_own_cgroup(tmp_path: Path) -> None:
+    proc_cgroup = tmp_path / "cgroup"
+    proc_cgroup.write_text("0::/system.slice/train.service\n")
+    cgroup = tmp_path / "system.slice" / "train.service"
+    cgroup.mkdir(parents=True)
+    _write_psi(cgroup, "io", some_us=0, full_us=0)
+
+    assert get_own_cgroup_path(str(tmp_path), str(proc_cgroup)) == str(cgroup)
+
+    proc_cgroup.write_text("12:memory:/docker/abc\n")
+    assert get_own_cgroup_path(str(tmp_path), str(proc_cgroup)) is None
+
+    with pytest.raises(ValueError):
+        PressureMetrics(scope="container")
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import time
+
+import pytest
+
+from iometrics.average_metrics import AverageMetrics
+from iometrics.sampler import AdaptiveSampler
+from iometrics.sampler import MetricsSampler
+from tests.helpers import FakeMeter
+
+
+def test_average_metrics_time_weighted() -> None:
+    metric = AverageMetrics()
+    metric.update(100.0, weight=0.25)
+    metric.update(0.0, weight=9.75)
+
+    assert metric.val == 0.0
+    assert metric.avg == pytest.approx(2.5)
+    assert metric.count == 2
+
+
+def test_adaptive_sampler_speeds_up_and_backs_off(fake_meter: FakeMeter) -> None:
+    sampler = AdaptiveSampler([fake_meter], min_interval_secs=0.5, max_interval_secs=8.0, busy_mb_ps=1.0)
+
+    for _ in range(20):
+        sampler.next_interval()
+    assert sampler.interval_secs == 8.0
+
+    fake_meter.mb_read.update(50.0)
+    for _ in range(20):
+        sampler.next_interval()
+    assert sampler.interval_secs == 0.5
+
+
+def test_sampler_reports_effective_rate(fake_meter: FakeMeter) -> None:
+    sampler = MetricsSampler([fake_meter], interval_secs=0.01)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+
+    assert fake_meter.updates > 5
+    assert 0 < sampler.sample_rate_hz.avg <= 100
+
+
+def test_sampler_survives_a_failing_sample(fake_meter: FakeMeter) -> None:
+    class FlakyMeter:
+        def __init__(self) -> None:
+            self.calls = 0
+
+        def update_stats(self) -> None:
+            self.calls += 1
+            if self.calls == 1:
+                raise KeyError("veth0")
+
+    sampler = MetricsSampler([FlakyMeter(), fake_meter], interval_secs=0.01)
+    sampler.start()
+    time.sleep(0.2)
+    alive = sampler._thread.is_alive()  # pylint: disable=protected-access
+    sampler.stop()
+
+    assert alive
+    assert sampler.failed_samples == 1
+    assert fake_meter.updates > 1
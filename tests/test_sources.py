@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+from typing import Dict
+
+import pytest
+
+from iometrics.exporter import MetricsExporter
+from iometrics.sources import MetricSource
+from iometrics.sources import ProcessIOSource
+from iometrics.sources import SourceScheduler
+from iometrics.sources import available_sources
+from iometrics.sources import get_source
+from iometrics.sources import register_source
+
+
+class CountingSource(MetricSource):
+
+    """Source whose counters are set by the test."""
+
+    RATES = {"mb_done": ("bytes_done", 1e-6)}
+    GAUGES = {"queued": ("queue_len", 1.0)}
+
+    def __init__(self) -> None:
+        self.counters: Dict[str, float] = {"bytes_done": 0.0, "queue_len": 0.0}
+        super().__init__()
+
+    def read(self) -> Dict[str, float]:
+        return dict(self.counters)
+
+
+def test_metric_source_rates_and_gauges() -> None:
+    source = CountingSource()
+    start = source.last_log_time
+
+    source.counters = {"bytes_done": 4e6, "queue_len": 3.0}
+    source.update_from(source.read(), start + 2.0)
+    assert source.metrics["mb_done"].val == pytest.approx(2.0)
+    assert source.metrics["queued"].val == 3.0
+
+    # Counters going backwards are clamped instead of producing negative rates.
+    source.counters = {"bytes_done": 0.0, "queue_len": 1.0}
+    source.update_from(source.read(), start + 3.0)
+    assert source.metrics["mb_done"].val == 0.0
+
+
+def test_registry() -> None:
+    assert {"net", "disk", "nfs", "memory", "pressure", "process", "trace"} <= set(available_sources())
+    assert isinstance(get_source("process"), ProcessIOSource)
+
+    with pytest.raises(ValueError):
+        get_source("nope")
+    with pytest.raises(ValueError):
+        register_source("disk")(CountingSource)
+
+
+def test_scheduler_shares_one_timestamp() -> None:
+    scheduler = SourceScheduler({"first": CountingSource(), "process": ProcessIOSource(), "disk": get_source("disk")})
+    scheduler.sample()
+
+    first, process = scheduler.sources["first"], scheduler.sources["process"]
+    assert first.last_log_time == process.last_log_time
+    assert process.metrics["mb_wchar"].count == 1
+
+
+def test_exporter_exposes_sources() -> None:
+    exporter = MetricsExporter(port=0, host="127.0.0.1", track_disk_utilization=False, sources=["process"])
+    try:
+        text = exporter.get_payload().decode("utf-8")
+        assert "# TYPE iometrics_source_process_mb_read gauge" in text
+        assert "iometrics_source_process_read_calls " in text
+    finally:
+        exporter.stop()
+
+
+def test_exporter_family_names_are_unique() -> None:
+    exporter = MetricsExporter(port=0, host="127.0.0.1", track_disk_utilization=False, sources=["process", "trace"])
+    try:
+        text = exporter.get_payload().decode("utf-8")
+    finally:
+        exporter.stop()
+
+    families = [line.split(" ")[2] for line in text.splitlines() if line.startswith("# TYPE ")]
+    assert "iometrics_trace_calls" in families
+    assert "iometrics_source_trace_calls" in families
+    assert len(families) == len(set(families))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+import pytest
+
+from iometrics.timeseries import TimeSeriesStore
+from tests.helpers import FakeMeter
+
+
+def _filled_store(meter: FakeMeter, num_rows: int, budget_bytes: int = 1024) -> TimeSeriesStore:
+    store = TimeSeriesStore({"disk": meter}, budget_bytes=budget_bytes)
+    for index in range(num_rows):
+        meter.mb_read.update(float(index))
+        meter.io_util.update(50.0)
+        store.record(now=float(index))
+    return store
+
+
+def test_timeseries_store_columns(fake_meter: FakeMeter) -> None:
+    store = _filled_store(fake_meter, 3)
+
+    assert store.metric_names == ["disk.mb_read", "disk.io_util"]
+    assert len(store) == 3
+    assert list(store.columns["disk.mb_read.mean"][:3]) == [0.0, 1.0, 2.0]
+    assert store.memory_bytes() <= 1024
+
+
+def test_timeseries_store_downsamples_under_budget(fake_meter: FakeMeter) -> None:
+    store = _filled_store(fake_meter, 1000)
+
+    assert store.compactions > 0
+    assert len(store) <= store.capacity
+    assert sum(store.counts[: len(store)]) == 1000
+
+    timestamps = list(store.timestamps[: len(store)])
+    assert timestamps == sorted(timestamps)
+    assert timestamps[-1] == 999.0
+
+    # Oldest bucket keeps the extremes and the mean of what it merged.
+    count = store.counts[0]
+    assert store.columns["disk.mb_read.min"][0] == 0.0
+    assert store.columns["disk.mb_read.max"][0] == count - 1
+    assert store.columns["disk.mb_read.mean"][0] == pytest.approx((count - 1) / 2)
+    assert store.columns["disk.io_util.mean"][0] == 50.0
+
+
+def test_timeseries_store_too_small_budget(fake_meter: FakeMeter) -> None:
+    with pytest.raises(ValueError):
+        TimeSeriesStore({"disk": fake_meter}, budget_bytes=64)
+
+
+def test_timeseries_store_to_numpy_is_zero_copy(fake_meter: FakeMeter) -> None:
+    np = pytest.importorskip("numpy")
+
+    store = _filled_store(fake_meter, 1000)
+    arrays = store.to_numpy()
+
+    assert len(arrays["timestamp"]) == len(store)
+    assert np.shares_memory(arrays["disk.mb_read.mean"], np.frombuffer(store.columns["disk.mb_read.mean"]))
+    assert int(arrays["count"].sum()) == 1000
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from iometrics import tracing
+from iometrics.tracing import TracingMetrics
+from iometrics.tracing import get_trace_stats
+from iometrics.tracing import trace_io
+from iometrics.tracing import traced_open
+
+
+def test_traced_open_counts_bytes_and_calls(tmp_path: Path) -> None:
+    path = tmp_path / "shard.bin"
+    with traced_open(path, "wb", tag="test_shards_writ") as file:
+        file.write(b"x" * 1000)
+
+    with traced_open(path, "rb", tag="test_shards") as file:
+        assert file.read(600) == b"x" * 600
+        buffer = bytearray(1000)
+        assert file.readinto(buffer) == 400
+        assert file.tell() == 1000
+
+    stats = get_trace_stats()
+    assert stats["test_shards_writ"].bytes_writ == 1000
+    assert stats["test_shards"].bytes_read == 1000
+    assert stats["test_shards"].calls == 2
+    assert stats["test_shards"].latency_ns > 0
+
+
+def test_trace_io_merges_threads() -> None:
+    @trace_io("test_getitem")
+    def getitem(index: int) -> bytes:
+        return b"y" * index
+
+    def worker() -> None:
+        for index in range(10):
+            getitem(index)
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with trace_io("test_getitem") as span:
+        span.bytes_read += 5
+
+    stats = get_trace_stats()["test_getitem"]
+    assert stats.calls == 41
+    assert stats.bytes_read == 4 * sum(range(10)) + 5
+
+
+def test_tracing_metrics_rates() -> None:
+    trace = TracingMetrics(tags=["test_rates", "test_unused"])
+    time.sleep(0.01)
+
+    with trace_io("test_rates") as span:
+        span.bytes_read += 2_000_000
+    trace.update_stats()
+
+    rates = trace.per_tag_stats_ps["test_rates"]
+    assert rates.mb_read_ps > 0
+    assert rates.latency_ms > 0
+    assert trace.per_tag_stats_ps["test_unused"].calls_ps == 0
+    assert trace.mb_read.val == pytest.approx(rates.mb_read_ps)
+
+
+def test_traced_file_line_methods(tmp_path: Path) -> None:
+    path = tmp_path / "index.txt"
+    with traced_open(path, "w", encoding="utf-8", tag="test_lines_writ") as file:
+        file.writelines(f"line {index}\n" for index in range(3))
+
+    with traced_open(path, "rb", buffering=0, tag="test_lines") as raw_file:
+        assert raw_file.readlines() == [b"line 0\n", b"line 1\n", b"line 2\n"]
+    with traced_open(path, "rb", tag="test_lines") as file:
+        assert file.read1(4) == b"line"
+
+    stats = get_trace_stats()
+    assert stats["test_lines_writ"].bytes_writ == 21
+    assert stats["test_lines_writ"].calls == 1
+    assert stats["test_lines"].bytes_read == 21 + 4
+    assert stats["test_lines"].calls == 2
+
+
+def test_exited_threads_are_retired() -> None:
+    def worker() -> None:
+        with trace_io("test_retired") as span:
+            span.bytes_read += 10
+
+    before = len(tracing._thread_tables)  # pylint: disable=protected-access
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert get_trace_stats()["test_retired"].bytes_read == 80
+    assert len(tracing._thread_tables) <= before  # pylint: disable=protected-access
+    # Retired counters keep counting towards the totals.
+    assert get_trace_stats()["test_retired"].calls == 8